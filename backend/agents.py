@@ -1,47 +1,256 @@
+import logging
 import os
-import google.generativeai as genai
+import threading
+import time
+import weakref
+from concurrent.futures import TimeoutError as FuturesTimeout
 from dotenv import load_dotenv
-from google.generativeai.types import FunctionDeclaration, Tool
 from .tools import (
+    book_rooms,
+    cancel_booking,
     check_room_availability,
+    confirm_booking,
     get_facility_info,
     get_menu_items,
     place_restaurant_order,
     create_room_service_request
 )
+from .session_cache import SessionCache
+from .history import HistoryBuilder
+from .conversations import ConversationStore
+from .faq_cache import FaqCache, tracking_tool_calls, note_tool_call
+from .intent import IntentClassifier, RoutingStats
+from .llm import get_provider, FunctionResult
+from .unit_of_work import unit_of_work
+from .concurrency import tool_executor, follow_up_executor, submit_in_context
+from .observability import span
+from .usage import usage_meter, tools_label
 
 load_dotenv()
 
-api_key = os.getenv("OPENAI_API_KEY") # Keeping the env var name same for simplicity, or user can change it
-if not api_key:
-    print("CRITICAL WARNING: API Key is not set!")
+logger = logging.getLogger(__name__)
 
-genai.configure(api_key=api_key)
+# Gemini by default; LLM_BACKEND=stub runs fully offline (see backend/llm.py)
+provider = get_provider()
+
+SESSION_CACHE_MAX_ENTRIES = int(os.getenv("SESSION_CACHE_MAX_ENTRIES", "1000"))
+SESSION_IDLE_TTL_SECONDS = int(os.getenv("SESSION_IDLE_TTL_SECONDS", "1800"))
+SESSION_CACHE_MAX_BYTES = int(os.getenv("SESSION_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+# Messages the local classifier scores at or above this go straight to an agent
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.6"))
+
+# Rounds of tool calls a turn may make before the agent must answer
+AGENT_MAX_TOOL_STEPS = int(os.getenv("AGENT_MAX_TOOL_STEPS", "4"))
+# How long a read-only tool may run before the model is told it timed out
+TOOL_TIMEOUT_SECONDS = float(os.getenv("TOOL_TIMEOUT_SECONDS", "10"))
+
+# Timed-out tools still running on the tool pool (a running thread can't be stopped)
+overrun_tools = set()
 
 # --- Tool Wrappers for Gemini ---
 # Gemini SDK can accept functions directly, which is much easier!
 
-receptionist_tools_list = [check_room_availability, get_facility_info]
+receptionist_tools_list = [check_room_availability, book_rooms, confirm_booking, cancel_booking, get_facility_info]
 restaurant_tools_list = [get_menu_items, place_restaurant_order]
 room_service_tools_list = [create_room_service_request]
 
+# Tools that write to the database. They share the turn's session, which is not
+# thread-safe, so they run one at a time instead of on the tool pool. The booking
+# tools commit on their own, but run here too so a slow claim is never reported
+# to the model as timed out after it went through.
+WRITE_TOOLS = {"place_restaurant_order", "create_room_service_request", "book_rooms", "confirm_booking", "cancel_booking"}
+
+# Tools whose output is the answer. When a response only calls these, the result
+# goes straight to the guest instead of back through the model to be repeated.
+PASSTHROUGH_TOOLS = {"get_menu_items", "get_facility_info"}
+# What the chat session learns about a passthrough answer:
+#   off         the exchange is recorded in its history, no model call (default)
+#   background  the results are also sent to the model, off the request path
+PASSTHROUGH_FOLLOW_UP = os.getenv("PASSTHROUGH_FOLLOW_UP", "off")
+
 # --- Agents ---
 
 class ResortAgent:
-    def __init__(self, system_prompt, tools):
+    def __init__(self, system_prompt, tools, name="Agent"):
+        self.name = name  # Usage is accounted under this name
         self.system_prompt = system_prompt
         self.tools = tools
-        self.model = genai.GenerativeModel(
-            model_name='gemini-2.0-flash-exp', # Using Flash for speed/cost
-            tools=self.tools,
-            system_instruction=self.system_prompt
-        )
-        self.chat_session = self.model.start_chat(enable_automatic_function_calling=False)
+        # Built once: model construction introspects every tool function for its schema
+        self.model = provider.create_model(self.system_prompt, self.tools)
+        # Background follow-ups still running, by chat session
+        self._follow_ups = weakref.WeakKeyDictionary()
+        self._follow_ups_lock = threading.Lock()
+        # Sessions whose turn failed midway; their history may end in an unanswered call
+        self._failed_sessions = weakref.WeakSet()
+
+    def new_session(self, history=None):
+        """history: optional [(role, text)] the session opens with (see history.py)."""
+        return self.model.start_chat(history)
+
+    def send(self, chat_session, message, conversation_id=None):
+        """chat_session.send, timed and with its token usage recorded."""
+        tool = tools_label(message)
+        start = time.perf_counter()
+        with span("post_tool_llm" if tool else "agent_llm"):
+            response = chat_session.send(message)
+        usage_meter.record(self.name, tool, conversation_id, response.usage, time.perf_counter() - start)
+        return response
+
+    def stream(self, chat_session, message, conversation_id=None):
+        """chat_session.stream, timed and with its token usage recorded once the reply is complete."""
+        tool = tools_label(message)
+        start = time.perf_counter()
+        usage = None
+        try:
+            with span("post_tool_llm" if tool else "agent_llm"):
+                for chunk in chat_session.stream(message):
+                    usage = chunk.usage or usage
+                    yield chunk
+        finally:
+            usage_meter.record(self.name, tool, conversation_id, usage, time.perf_counter() - start)
+
+    def call_tool(self, function_name, function_args):
+        """Runs the named tool; returns None if this agent has no such tool."""
+        for tool_func in self.tools:
+            if tool_func.__name__ == function_name:
+                with span(f"tool:{function_name}"):
+                    return tool_func(**function_args)
+        return None
+
+    def run_tool(self, function_name, function_args):
+        """call_tool, with unknown tools and tool errors reported as the result for the model."""
+        try:
+            result = self.call_tool(function_name, function_args)
+        except Exception as e:
+            logger.exception("Tool %s failed", function_name)
+            result = f"Error: {function_name} failed: {e}"
+        if result is None:
+            result = f"Error: Function {function_name} not found."
+        note_tool_call(function_name, result)
+        return result
+
+    def dispatch_tools(self, function_calls):
+        """
+        Runs the function calls from one model response and returns their results in call order.
 
-    def process_message(self, history):
-        # History management in Gemini is stateful in the object, but our API is stateless per request.
-        # For this simple implementation, we will just send the last user message.
-        # In a real production app, we'd reconstruct the history properly.
+        Read-only tools start together on the tool pool and each gets TOOL_TIMEOUT_SECONDS.
+        Writing tools run one at a time on this thread in one unit of work: they share a
+        session and transaction, committed once before any result goes back to the model
+        (so the guest is never told about a write that didn't land). A tool that fails
+        rolls back only its own savepoint. The transaction is not held across model calls, which would block
+        every other turn's writes.
+        """
+        futures = {
+            i: submit_in_context(tool_executor, self.run_tool, fn.name, fn.args)
+            for i, fn in enumerate(function_calls) if fn.name not in WRITE_TOOLS
+        }
+        # Timed from submission: the reads run alongside the writes below, and how long
+        # the writes take neither adds to nor eats into their budget
+        deadline = time.monotonic() + TOOL_TIMEOUT_SECONDS
+        results = [None] * len(function_calls)
+        with unit_of_work():
+            for i, fn in enumerate(function_calls):
+                if fn.name in WRITE_TOOLS:
+                    results[i] = self.run_tool(fn.name, fn.args)
+        for i, future in futures.items():
+            try:
+                results[i] = future.result(timeout=max(deadline - time.monotonic(), 0))
+            except FuturesTimeout:
+                # cancel() only stops a tool still waiting for a worker. A running tool keeps
+                # its pool thread until it returns, so hung tools can tie up at most
+                # TOOL_MAX_WORKERS threads; after that, reads time out instead of running.
+                if not future.cancel():
+                    logger.warning("Tool %s still running after its timeout", function_calls[i].name)
+                    overrun_tools.add(future)
+                    future.add_done_callback(overrun_tools.discard)
+                results[i] = f"Error: {function_calls[i].name} timed out after {TOOL_TIMEOUT_SECONDS:g}s."
+        return results
+
+    def passthrough_answer(self, function_calls, results):
+        """The guest-facing answer if every call was a passthrough tool that succeeded, else None."""
+        if not all(fn.name in PASSTHROUGH_TOOLS for fn in function_calls):
+            return None
+        if any(str(result).startswith("Error") for result in results):
+            return None  # Let the model explain the failure
+        return "\n\n".join(str(result) for result in results)
+
+    def finish_passthrough(self, chat_session, function_results, answer, conversation_id=None):
+        """Brings the chat session up to date with an answer the model didn't write."""
+        if PASSTHROUGH_FOLLOW_UP != "background":
+            chat_session.record(function_results, answer)
+            return
+
+        def follow_up():
+            try:
+                # The reply only goes into the session history
+                self.send(chat_session, function_results, conversation_id)
+            except Exception:
+                chat_session.record(function_results, answer)
+
+        # Sized now: once the follow-up starts, the history is its thread's to change
+        size = chat_session.size()
+        with self._follow_ups_lock:
+            self._follow_ups[chat_session] = (follow_up_executor.submit(follow_up), size)
+
+    def wait_for_follow_up(self, chat_session):
+        # A chat session takes one message at a time
+        with self._follow_ups_lock:
+            pending = self._follow_ups.pop(chat_session, None)
+        if pending is not None:
+            pending[0].result()
+
+    def session_size(self, chat_session):
+        """chat_session.size(), or its size before a background follow-up that is still running."""
+        with self._follow_ups_lock:
+            pending = self._follow_ups.get(chat_session)
+        if pending is not None and not pending[0].done():
+            return pending[1]  # Counted in full when the next turn re-stores the session
+        return chat_session.size()
+
+    def answer_unrun_calls(self, chat_session, function_calls, reply):
+        """
+        Records an error result for function calls that won't be run, and the reply
+        the guest got. Gemini rejects a message that follows an unanswered function
+        call, so without this the session could never be used again.
+        """
+        chat_session.record([FunctionResult(fn.name, f"Error: {fn.name} was not run: tool step limit reached.")
+                             for fn in function_calls], reply)
+
+    def mark_failed(self, chat_session):
+        self._failed_sessions.add(chat_session)
+
+    def session_failed(self, chat_session):
+        """Whether a turn failed midway in this session, which then shouldn't be kept."""
+        failed = chat_session in self._failed_sessions
+        self._failed_sessions.discard(chat_session)
+        return failed
+
+    def fallback_answer(self, response, function_results):
+        """The guest-facing answer when the turn ends on a response that isn't plain text."""
+        # If it's a text response, return it
+        if response.text:
+            return response.text
+
+        # Otherwise show the tool output as-is
+        if function_results:
+            return "\n\n".join(str(result.result) for result in function_results)
+
+        # Check if content was blocked
+        if response.blocked_reason:
+            return f"I apologize, but I couldn't generate a response. The content may have been blocked. Feedback: {response.blocked_reason}"
+        return "I apologize, but I couldn't generate a response at this time. Please try rephrasing your request."
+
+    def process_message(self, history, chat_session=None, keep_session=None, conversation_id=None):
+        # The chat session carries the conversation, so only the last user message is sent.
+        # Without a session (no conversation id) each turn starts from scratch.
+        # A session that won't be kept needn't learn about passthrough answers.
+        # conversation_id is only used to account token usage.
+        if keep_session is None:
+            keep_session = chat_session is not None
+        if chat_session is None:
+            chat_session = self.new_session()
+        self.wait_for_follow_up(chat_session)
         
         last_user_message = next((m['content'] for m in reversed(history) if m['role'] == 'user'), None)
         
@@ -49,71 +258,113 @@ class ResortAgent:
             return "How can I help you?"
 
         try:
-            response = self.chat_session.send_message(last_user_message)
-            
-            # Manual function calling - check if model wants to call a function
-            if response.parts and len(response.parts) > 0:
-                for part in response.parts:
-                    # Check if this part is a function call
-                    if hasattr(part, 'function_call') and part.function_call:
-                        fn = part.function_call
-                        function_name = fn.name
-                        function_args = dict(fn.args) if fn.args else {}
-                        
-                        print(f"Function call detected: {function_name} with args: {function_args}")
-                        
-                        # Find and execute the function
-                        function_result = None
-                        for tool_func in self.tools:
-                            if tool_func.__name__ == function_name:
-                                function_result = tool_func(**function_args)
-                                break
-                        
-                        if function_result is not None:
-                            # Send the function response back to the model
-                            response2 = self.chat_session.send_message(
-                                genai.protos.Content(
-                                    parts=[genai.protos.Part(
-                                        function_response=genai.protos.FunctionResponse(
-                                            name=function_name,
-                                            response={"result": function_result}
-                                        )
-                                    )]
-                                )
-                            )
-                            return response2.text if response2.text else function_result
-                        else:
-                            return f"Error: Function {function_name} not found."
-                    
-                    # If it's a text response, return it
-                    elif hasattr(part, 'text'):
-                        return part.text
-                
-                # If we have parts but couldn't extract text or function call
-                return response.text if hasattr(response, 'text') else "I apologize, but I couldn't generate a response."
-            else:
-                # Check if content was blocked
-                if hasattr(response, 'prompt_feedback'):
-                    feedback = response.prompt_feedback
-                    return f"I apologize, but I couldn't generate a response. The content may have been blocked. Feedback: {feedback}"
-                else:
-                    return "I apologize, but I couldn't generate a response at this time. Please try rephrasing your request."
+            # Tool loop: run every call the model asks for, send all results back in one
+            # message, and repeat until it answers in text or the step limit is reached
+            message = last_user_message
+            function_results = []
+            for step in range(AGENT_MAX_TOOL_STEPS + 1):
+                response = self.send(chat_session, message, conversation_id)
+                if not response.function_calls:
+                    break
+                if step == AGENT_MAX_TOOL_STEPS:
+                    logger.warning("Tool step limit (%d) reached", AGENT_MAX_TOOL_STEPS)
+                    answer = self.fallback_answer(response, function_results)
+                    if keep_session:
+                        self.answer_unrun_calls(chat_session, response.function_calls, answer)
+                    return answer
+
+                logger.debug("Function calls: %s", [(fn.name, fn.args) for fn in response.function_calls])
+                results = self.dispatch_tools(response.function_calls)
+                function_results = [FunctionResult(fn.name, result)
+                                    for fn, result in zip(response.function_calls, results)]
+                answer = self.passthrough_answer(response.function_calls, results)
+                if answer is not None:
+                    if keep_session:
+                        self.finish_passthrough(chat_session, function_results, answer, conversation_id)
+                    return f"{response.text}\n\n{answer}" if response.text else answer
+                message = function_results
+
+            return self.fallback_answer(response, function_results)
         except IndexError as e:
             # Specific handling for the list index out of range error
-            import traceback
-            traceback.print_exc()
+            logger.exception("Agent turn failed")
+            self.mark_failed(chat_session)
             return "I apologize, but I encountered an issue processing your request. This may be due to content filtering. Please try rephrasing your question."
         except Exception as e:
-            import traceback
-            traceback.print_exc()
+            logger.exception("Agent turn failed")
+            self.mark_failed(chat_session)
             return f"I encountered an error: {str(e)}"
 
+    def stream_message(self, history, chat_session=None, keep_session=None, conversation_id=None):
+        """
+        Streaming variant of process_message. Yields events as they happen:
+            {"type": "tool", "name": ..., "args": ...}   before a tool runs
+            {"type": "tool_result", "name": ...}         after it returns
+            {"type": "token", "text": ...}               for each chunk of model text
+        """
+        if keep_session is None:
+            keep_session = chat_session is not None
+        if chat_session is None:
+            chat_session = self.new_session()
+        self.wait_for_follow_up(chat_session)
+
+        last_user_message = next((m['content'] for m in reversed(history) if m['role'] == 'user'), None)
+
+        if not last_user_message:
+            yield {"type": "token", "text": "How can I help you?"}
+            return
+
+        message = last_user_message
+        produced_text = False
+        function_results = []
+        unanswered = []  # Calls left unrun at the step limit
+        # Same tool loop as process_message
+        for step in range(AGENT_MAX_TOOL_STEPS + 1):
+            function_calls = []
+            step_text = []
+            for chunk in self.stream(chat_session, message, conversation_id):
+                function_calls += chunk.function_calls
+                if chunk.text:
+                    produced_text = True
+                    step_text.append(chunk.text)
+                    yield {"type": "token", "text": chunk.text}
+
+            if not function_calls:
+                break
+            if step == AGENT_MAX_TOOL_STEPS:
+                logger.warning("Tool step limit (%d) reached", AGENT_MAX_TOOL_STEPS)
+                unanswered = function_calls
+                break
+
+            for fn in function_calls:
+                yield {"type": "tool", "name": fn.name, "args": fn.args}
+            results = self.dispatch_tools(function_calls)
+            for fn in function_calls:
+                yield {"type": "tool_result", "name": fn.name}
+            function_results = [FunctionResult(fn.name, result) for fn, result in zip(function_calls, results)]
+            answer = self.passthrough_answer(function_calls, results)
+            if answer is not None:
+                if keep_session:
+                    self.finish_passthrough(chat_session, function_results, answer, conversation_id)
+                yield {"type": "token", "text": f"\n\n{answer}" if produced_text else answer}
+                return
+            message = function_results
+
+        if not produced_text:
+            # Same fallbacks as process_message: the raw tool output, else an apology
+            text = "\n\n".join(str(result.result) for result in function_results)
+            step_text = [text or "I apologize, but I couldn't generate a response at this time. Please try rephrasing your request."]
+            yield {"type": "token", "text": step_text[0]}
+        if unanswered and keep_session:
+            self.answer_unrun_calls(chat_session, unanswered, "".join(step_text))
+
 # System Prompts
 RECEPTIONIST_PROMPT = """You are the Resort Receptionist. 
 Your duties: 
 1. Answer FAQs (Check-in/out times, Wi-Fi, Parking).
-2. Check room availability using the `check_room_availability` tool.
+2. Check room availability using the `check_room_availability` tool, with the guest's check-in and check-out dates (YYYY-MM-DD) when they give them.
 3. Provide facility info (Gym, Spa, Pool, Restaurant) using the `get_facility_info` tool.
+4. Book rooms with the `book_rooms` tool once the guest has chosen room types, dates and the name to book under. This holds the rooms for a few minutes: read back the rooms, dates, total and booking reference, and call `confirm_booking` only when the guest agrees. Use `cancel_booking` if they change their mind.
 
 Be polite, professional, and welcoming. 
 If a guest asks about check-in/out, use the `get_facility_info` tool with arguments "check-in" or "check-out".
@@ -121,7 +372,7 @@ If a guest asks for food or room service, politely direct them to the Restaurant
 
 RESTAURANT_PROMPT = """You are the Resort Restaurant Agent.
 Your duties: Show the menu, take food orders.
-1. When asked for the menu, call the `get_menu_items` tool. **You MUST display the EXACT output returned by the tool.** Do not summarize or just say "Here is the menu". Show the full list.
+1. When asked for the menu, call the `get_menu_items` tool. If the guest asks about one part of the menu (e.g. breakfast, desserts, drinks), pass it as the `category` argument; otherwise use "all". **You MUST display the EXACT output returned by the tool.** Do not summarize or just say "Here is the menu". Show the full list.
 2. ALWAYS ask for the Room Number before placing an order.
 3. When taking an order, confirm the items and calculate the total bill."""
 
@@ -144,36 +395,178 @@ If unsure, default to 'Receptionist'."""
 
 class AgentManager:
     def __init__(self):
-        # We create fresh agents for now to avoid state issues in this simple design
-        pass
+        # Agents and the router are stateless model wrappers, built once and shared by all turns.
+        # Per-conversation state lives in chat sessions, cached by (conversation_id, agent type).
+        self.agents = {
+            "Receptionist": ResortAgent(RECEPTIONIST_PROMPT, receptionist_tools_list, "Receptionist"),
+            "Restaurant": ResortAgent(RESTAURANT_PROMPT, restaurant_tools_list, "Restaurant"),
+            "RoomService": ResortAgent(ROOM_SERVICE_PROMPT, room_service_tools_list, "RoomService"),
+        }
+        self.router_model = provider.create_model(ROUTER_PROMPT)
+        self.sessions = SessionCache(
+            max_entries=SESSION_CACHE_MAX_ENTRIES,
+            idle_ttl=SESSION_IDLE_TTL_SECONDS,
+            max_bytes=SESSION_CACHE_MAX_BYTES,
+            # Entries are (chat_session, number of client history messages it has seen, size),
+            # sized by the agent (see ResortAgent.session_size)
+            size_fn=lambda entry: entry[2],
+        )
+        self.history_builder = HistoryBuilder()
+        self.conversations = ConversationStore()
+        self.faq_cache = FaqCache()
+        self.intent_classifier = IntentClassifier()
+        self.routing_stats = RoutingStats()
 
     def get_agent(self, agent_type):
-        if agent_type == "Restaurant":
-            return ResortAgent(RESTAURANT_PROMPT, restaurant_tools_list)
-        elif agent_type == "RoomService":
-            return ResortAgent(ROOM_SERVICE_PROMPT, room_service_tools_list)
-        else:
-            return ResortAgent(RECEPTIONIST_PROMPT, receptionist_tools_list)
-
-    def route_request(self, text):
-        model = genai.GenerativeModel('gemini-2.0-flash-exp', system_instruction=ROUTER_PROMPT)
-        response = model.generate_content(text)
+        return self.agents.get(agent_type, self.agents["Receptionist"])
+
+    def route_request(self, text, conversation_id=None):
+        with span("route"):
+            return self._route(text, conversation_id)
+
+    def _route(self, text, conversation_id=None):
+        # Fast path: local keyword classifier, no round trip
+        label, confidence = self.intent_classifier.classify(text)
+        if label and confidence >= INTENT_CONFIDENCE_THRESHOLD:
+            self.routing_stats.record("fast_path", label)
+            return label
+
+        label = self.route_with_llm(text, conversation_id)
+        self.routing_stats.record("llm_fallback", label)
+        return label
+
+    def route_with_llm(self, text, conversation_id=None):
+        start = time.perf_counter()
+        response = self.router_model.generate(text)
+        usage_meter.record("Router", "", conversation_id, response.usage, time.perf_counter() - start)
         intent = response.text.strip()
         # Clean up any extra chars
         if "Restaurant" in intent: return "Restaurant"
         if "RoomService" in intent: return "RoomService"
         return "Receptionist"
 
-    def chat(self, history):
+    def open_session(self, agent, agent_name, history, conversation_id=None):
+        """
+        The agent's chat session, up to date with the history the client sent.
+        A new session opens with the built history (recent messages plus a facts
+        summary); a cached one records the messages exchanged with other agents
+        since its last turn. Returns (chat_session, messages it will have seen).
+        """
+        prior = history[:_last_user_index(history)]
+        seen = len(prior) + 2  # After this turn: the new message and the reply
+        if conversation_id:
+            entry = self.sessions.get((conversation_id, agent_name))
+            if entry and entry[1] <= len(prior):
+                chat_session, session_seen, _ = entry
+                contents = self.history_builder.recent_contents(prior[session_seen:])
+                for (_, user_text), (_, model_text) in zip(contents[::2], contents[1::2]):
+                    chat_session.record(user_text, model_text)
+                return chat_session, seen
+        return agent.new_session(self.history_builder.build(prior, conversation_id)), seen
+
+    def chat(self, history, conversation_id=None):
         # Get the latest message
         user_text = next((m['content'] for m in reversed(history) if m['role'] == 'user'), "")
+
+        # 0. A question answered before from facility data needs no model at all
+        answer = self.faq_cache.lookup(user_text)
+        if answer is not None:
+            return answer
         
         # 1. Route
-        agent_name = self.route_request(user_text)
-        print(f"Routing '{user_text}' to: {agent_name}")
+        agent_name = self.route_request(user_text, conversation_id)
+        logger.debug("Routed to %s", agent_name, extra={"fields": {"agent": agent_name}})
         
         # 2. Delegate
         agent = self.get_agent(agent_name)
-        return agent.process_message(history)
+        chat_session, seen = self.open_session(agent, agent_name, history, conversation_id)
+        with tracking_tool_calls() as turn:
+            response = agent.process_message(history, chat_session, keep_session=bool(conversation_id),
+                                             conversation_id=conversation_id)
+        self.faq_cache.learn(user_text, turn)
+        if conversation_id:
+            if agent.session_failed(chat_session):
+                # Its history may end in an unanswered call; the next turn opens a fresh one
+                self.sessions.pop((conversation_id, agent_name))
+            else:
+                # Re-store so the size accounting sees the grown history
+                self.sessions.put((conversation_id, agent_name), (chat_session, seen, agent.session_size(chat_session)))
+        return response
+
+    def stream_chat(self, history, conversation_id=None):
+        """Streaming variant of chat: a route event, then the agent's events."""
+        user_text = next((m['content'] for m in reversed(history) if m['role'] == 'user'), "")
+
+        answer = self.faq_cache.lookup(user_text)
+        if answer is not None:
+            yield {"type": "route", "agent": "Receptionist", "cached": True}
+            yield {"type": "token", "text": answer}
+            return
+
+        agent_name = self.route_request(user_text, conversation_id)
+        yield {"type": "route", "agent": agent_name}
+
+        agent = self.get_agent(agent_name)
+        chat_session, seen = self.open_session(agent, agent_name, history, conversation_id)
+        finished = False
+        try:
+            with tracking_tool_calls() as turn:
+                yield from agent.stream_message(history, chat_session, keep_session=bool(conversation_id),
+                                                conversation_id=conversation_id)
+            self.faq_cache.learn(user_text, turn)
+            finished = True
+        finally:
+            if conversation_id:
+                if finished:
+                    self.sessions.put((conversation_id, agent_name), (chat_session, seen, agent.session_size(chat_session)))
+                else:
+                    # Failed or abandoned midway, maybe after a call the model is still waiting on
+                    self.sessions.pop((conversation_id, agent_name))
+
+    def converse(self, conversation_id, message):
+        """One turn of a server-held conversation: the client sends only the new message."""
+        with self.conversations.lock(conversation_id):
+            user_message = {"role": "user", "content": message}
+            history = self.conversations.get(conversation_id) + [user_message]
+            response = self.chat(history, conversation_id)
+            self.conversations.append(conversation_id, user_message, {"role": "assistant", "content": response})
+            return response
+
+    def stream_converse(self, conversation_id, message):
+        """Streaming variant of converse."""
+        with self.conversations.lock(conversation_id):
+            user_message = {"role": "user", "content": message}
+            history = self.conversations.get(conversation_id) + [user_message]
+            reply = []
+            for event in self.stream_chat(history, conversation_id):
+                if event["type"] == "token":
+                    reply.append(event["text"])
+                yield event
+            self.conversations.append(conversation_id, user_message, {"role": "assistant", "content": "".join(reply)})
+
+    def history_turn(self, history, conversation_id=None):
+        """
+        One turn where the client posts the whole history. A conversation_id still
+        names a cached chat session, so its turns run one at a time like converse's.
+        """
+        if not conversation_id:
+            return self.chat(history)
+        with self.conversations.lock(conversation_id):
+            return self.chat(history, conversation_id)
+
+    def stream_history_turn(self, history, conversation_id=None):
+        """Streaming variant of history_turn."""
+        if not conversation_id:
+            yield from self.stream_chat(history)
+            return
+        with self.conversations.lock(conversation_id):
+            yield from self.stream_chat(history, conversation_id)
+
+
+def _last_user_index(history):
+    for i in range(len(history) - 1, -1, -1):
+        if history[i].get("role") == "user":
+            return i
+    return len(history)
 
 manager = AgentManager()
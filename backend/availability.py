@@ -0,0 +1,231 @@
+import heapq
+import os
+import threading
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from itertools import chain
+from sqlalchemy import and_, event, inspect, or_
+from sqlalchemy.orm import Session
+from .database import SessionLocal
+from .models import Booking, Room
+
+# --- Room Availability Engine ---
+# Each room's occupancy is a bitmap with one bit per night, counted from the
+# day the engine loaded (an arbitrary-size int, so a year is ~365 bits).
+# "Which Deluxe rooms are free from A to B" is then one AND per room of that
+# type against the mask of nights A..B-1, with no database query: hundreds of
+# rooms and a year of bookings answer in microseconds.
+#
+# The database stays the source of truth. Committed new bookings are added to
+# the bitmaps as they are; committed updates and deletes of bookings mark their
+# rooms stale and the next query reloads only those rooms. A change to the
+# rooms themselves reloads everything. Bulk
+# UPDATEs in a session report their rooms with note_rooms_changed(); other
+# processes must call mark_rooms_stale() or invalidate(). A held room is
+# reloaded when its hold expires, so it shows free again without a write.
+#
+# The bitmaps answer "what can I offer"; claiming a room is checked against
+# the database (reservations.py).
+
+MAX_STAY_NIGHTS = int(os.getenv("MAX_STAY_NIGHTS", "30"))
+BOOKING_HORIZON_DAYS = int(os.getenv("BOOKING_HORIZON_DAYS", "365"))
+
+RoomInfo = namedtuple("RoomInfo", ["id", "number", "room_type", "price"])
+
+
+def active_booking(now=None):
+    """SQL condition for bookings that hold their room at `now` (UTC): confirmed, or held and not expired."""
+    now = now or datetime.utcnow()
+    return or_(Booking.status == "Confirmed",
+               and_(Booking.status == "Held", Booking.hold_expires_at > now))
+
+
+def parse_stay(check_in=None, check_out=None, today=None):
+    """
+    Validates a stay given as ISO dates ("2025-03-14"). check_in defaults to
+    today and check_out to the day after check_in. Returns (check_in, check_out)
+    as dates; raises ValueError with a message fit for the guest.
+    """
+    today = today or date.today()
+    try:
+        start = date.fromisoformat(check_in) if check_in else today
+        end = date.fromisoformat(check_out) if check_out else start + timedelta(days=1)
+    except ValueError:
+        raise ValueError("Please give the dates as YYYY-MM-DD.")
+    if start < today:
+        raise ValueError("The check-in date is in the past.")
+    if end <= start:
+        raise ValueError("The check-out date must be after the check-in date.")
+    if (end - start).days > MAX_STAY_NIGHTS:
+        raise ValueError(f"Stays can be booked for up to {MAX_STAY_NIGHTS} nights.")
+    if (end - today).days > BOOKING_HORIZON_DAYS:
+        raise ValueError(f"We take bookings up to {BOOKING_HORIZON_DAYS} days ahead.")
+    return start, end
+
+
+class AvailabilityEngine:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._epoch = None  # Night 0 of the bitmaps
+        self._rooms = {}  # room id -> RoomInfo
+        self._by_type = {}  # room type -> [RoomInfo], by room number
+        self._occupied = {}  # room id -> bitmap of booked nights
+        self._stale_rooms = set()
+        self._hold_expiries = []  # heap of (hold_expires_at, room id)
+        self._queued_expiries = set()  # what the heap holds, so reloads don't queue a hold twice
+
+    def invalidate(self):
+        """Reload rooms and bookings on the next query."""
+        with self._lock:
+            self._loaded = False
+
+    def mark_rooms_stale(self, room_ids):
+        """Reload these rooms' bookings on the next query."""
+        with self._lock:
+            self._stale_rooms.update(room_ids)
+
+    def add_bookings(self, bookings):
+        """Adds newly committed bookings: [(room id, check_in, check_out, hold_expires_at or None)]."""
+        with self._lock:
+            if not self._loaded:
+                return  # The first query loads them
+            for room_id, check_in, check_out, hold_expires_at in bookings:
+                if room_id in self._occupied and room_id not in self._stale_rooms:
+                    self._occupied[room_id] |= self._mask(check_in, check_out)
+                    self._queue_expiry(hold_expires_at, room_id)
+
+    def _queue_expiry(self, hold_expires_at, room_id):
+        expiry = (hold_expires_at, room_id)
+        if hold_expires_at is not None and expiry not in self._queued_expiries:
+            heapq.heappush(self._hold_expiries, expiry)
+            self._queued_expiries.add(expiry)
+
+    def _mask(self, start, end):
+        """Bits for the nights start .. end-1 (nights before the epoch are never booked here)."""
+        first = max((start - self._epoch).days, 0)
+        last = (end - self._epoch).days
+        if last <= first:
+            return 0
+        return ((1 << (last - first)) - 1) << first
+
+    def _bookings(self, db, now, room_ids=None):
+        query = db.query(Booking.room_id, Booking.check_in, Booking.check_out, Booking.hold_expires_at).filter(
+            active_booking(now),
+            Booking.check_out > self._epoch,
+        )
+        if room_ids is not None:
+            query = query.filter(Booking.room_id.in_(room_ids))
+        return query.all()
+
+    def _ensure_fresh(self):
+        # Called with the lock held
+        now = datetime.utcnow()
+        while self._hold_expiries and self._hold_expiries[0][0] <= now:
+            expiry = heapq.heappop(self._hold_expiries)
+            self._queued_expiries.discard(expiry)
+            self._stale_rooms.add(expiry[1])
+        if self._loaded and not self._stale_rooms:
+            return
+        db = SessionLocal()
+        try:
+            if not self._loaded:
+                self._epoch = date.today()
+                rooms = [RoomInfo(r.id, r.number, r.room_type, r.price)
+                         for r in db.query(Room).order_by(Room.room_type, Room.number)]
+                self._rooms = {room.id: room for room in rooms}
+                self._by_type = {}
+                for room in rooms:
+                    self._by_type.setdefault(room.room_type, []).append(room)
+                reload_ids = None
+                self._occupied = dict.fromkeys(self._rooms, 0)
+                self._hold_expiries = []
+                self._queued_expiries = set()
+            else:
+                reload_ids = set(self._stale_rooms)
+                for room_id in reload_ids:
+                    self._occupied[room_id] = 0
+            for room_id, check_in, check_out, hold_expires_at in self._bookings(db, now, reload_ids):
+                if room_id in self._occupied:
+                    self._occupied[room_id] |= self._mask(check_in, check_out)
+                    self._queue_expiry(hold_expires_at, room_id)
+            self._loaded = True
+            self._stale_rooms = set()
+        finally:
+            db.close()
+
+    def room_types(self):
+        """{room type: (number of rooms, lowest nightly price)}"""
+        with self._lock:
+            self._ensure_fresh()
+            return {room_type: (len(rooms), min(room.price for room in rooms))
+                    for room_type, rooms in self._by_type.items()}
+
+    def free_rooms(self, room_type, check_in, check_out):
+        """Rooms of the type (case-insensitive) free every night from check_in up to check_out."""
+        with self._lock:
+            self._ensure_fresh()
+            rooms = next((rooms for name, rooms in self._by_type.items()
+                          if name.lower() == room_type.lower()), [])
+            mask = self._mask(check_in, check_out)
+            return [room for room in rooms if not self._occupied[room.id] & mask]
+
+    def free_counts(self, check_in, check_out):
+        """{room type: number of rooms free for the whole stay}"""
+        with self._lock:
+            self._ensure_fresh()
+            mask = self._mask(check_in, check_out)
+            return {room_type: sum(1 for room in rooms if not self._occupied[room.id] & mask)
+                    for room_type, rooms in self._by_type.items()}
+
+
+availability = AvailabilityEngine()
+
+
+# --- Keeping the bitmaps in step with committed changes ---
+
+def _booked_room_ids(obj):
+    """The room a booking is in, and the one it was in if room_id just changed."""
+    history = inspect(obj).attrs.room_id.history
+    return {room_id for room_id in chain([obj.room_id], history.deleted or ()) if room_id is not None}
+
+
+def note_rooms_changed(session, room_ids):
+    """Marks rooms stale when the session commits, for booking changes made with bulk UPDATEs."""
+    session.info.setdefault("availability_changes", set()).update(room_ids)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    changed = session.info.setdefault("availability_changes", set())
+    added = session.info.setdefault("availability_new_bookings", [])
+    for obj in session.new:
+        if isinstance(obj, Booking):
+            if obj.status == "Confirmed" or (obj.status == "Held" and obj.hold_expires_at is not None):
+                added.append((obj.room_id, obj.check_in, obj.check_out, obj.hold_expires_at))
+        elif isinstance(obj, Room):
+            changed.add("rooms")
+    for obj in chain(session.dirty, session.deleted):
+        if isinstance(obj, Booking):
+            changed.update(_booked_room_ids(obj))
+        elif isinstance(obj, Room):
+            changed.add("rooms")
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_changes(session):
+    changed = session.info.pop("availability_changes", None)
+    added = session.info.pop("availability_new_bookings", None)
+    if changed and "rooms" in changed:
+        availability.invalidate()
+        return
+    if changed:
+        availability.mark_rooms_stale(changed)
+    if added:
+        availability.add_bookings(added)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop("availability_changes", None)
+    session.info.pop("availability_new_bookings", None)
@@ -0,0 +1,101 @@
+import asyncio
+import contextvars
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .observability import observe_stage
+
+# --- Chat Concurrency Limits ---
+# A chat turn makes blocking LLM calls and SQLite writes, so it must never run
+# on the event loop. Turns are handed to a dedicated executor instead; the
+# executor size caps how many turns are in flight and MAX_QUEUE caps how many
+# may wait for a free worker before new turns are rejected.
+
+CHAT_MAX_IN_FLIGHT = int(os.getenv("CHAT_MAX_IN_FLIGHT", "16"))
+CHAT_MAX_QUEUE = int(os.getenv("CHAT_MAX_QUEUE", "64"))
+
+
+class ChatOverloaded(Exception):
+    """Raised when a chat turn is rejected because the queue is full."""
+
+
+class ChatLimiter:
+    def __init__(self, max_in_flight=CHAT_MAX_IN_FLIGHT, max_queue=CHAT_MAX_QUEUE):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="chat")
+        # Only touched from the event loop thread, so no lock is needed.
+        self._pending = 0
+        self.rejected = 0
+
+    @property
+    def in_flight(self):
+        return min(self._pending, self.max_in_flight)
+
+    @property
+    def queued(self):
+        return max(self._pending - self.max_in_flight, 0)
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Schedules a blocking function on the chat executor and returns an awaitable future.
+        Raises ChatOverloaded instead of queueing when the queue is already full.
+        Must be called from the event loop.
+        """
+        if self._pending >= self.max_in_flight + self.max_queue:
+            self.rejected += 1
+            raise ChatOverloaded(
+                f"{self.in_flight} chat turns in flight and {self.queued} queued"
+            )
+
+        self._pending += 1
+        loop = asyncio.get_running_loop()
+        submitted = time.perf_counter()
+
+        def run():
+            observe_stage("chat_queue", time.perf_counter() - submitted)
+            return fn(*args, **kwargs)
+
+        # run_in_executor doesn't carry context variables over; the request id and trace must
+        future = loop.run_in_executor(self.executor, functools.partial(contextvars.copy_context().run, run))
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future):
+        self._pending -= 1
+
+    async def run(self, fn, *args, **kwargs):
+        """Runs a blocking function on the chat executor and waits for its result."""
+        return await self.submit(fn, *args, **kwargs)
+
+    def stats(self):
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "rejected": self.rejected,
+        }
+
+
+chat_limiter = ChatLimiter()
+
+
+# --- Tool Execution ---
+# Read-only tools requested together in one model response run side by side on
+# this pool; the agent waits for each with a per-tool timeout (see agents.py).
+
+TOOL_MAX_WORKERS = int(os.getenv("TOOL_MAX_WORKERS", "16"))
+
+tool_executor = ThreadPoolExecutor(max_workers=TOOL_MAX_WORKERS, thread_name_prefix="tool")
+
+
+def submit_in_context(executor, fn, *args):
+    """executor.submit, running fn with the caller's context variables (request id, trace)."""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+# Background model calls that don't block a reply (see PASSTHROUGH_FOLLOW_UP in agents.py)
+FOLLOW_UP_MAX_WORKERS = int(os.getenv("FOLLOW_UP_MAX_WORKERS", "4"))
+
+follow_up_executor = ThreadPoolExecutor(max_workers=FOLLOW_UP_MAX_WORKERS, thread_name_prefix="follow-up")
@@ -0,0 +1,108 @@
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from .database import SessionLocal
+from .models import Conversation
+from .session_cache import SessionCache
+
+# --- Server-side Conversation Store ---
+# Clients send only the new message and the conversation id that /chat returned;
+# the messages so far are kept here. Memory is bounded (LRU over conversations,
+# idle TTL, total bytes, and the newest CONVERSATION_MAX_MESSAGES per
+# conversation). With CONVERSATION_PERSIST=1 conversations are also written to
+# the `conversations` table, so they survive eviction and restarts until the TTL.
+#
+# Turns of one conversation are serialized with a per-conversation lock, so two
+# messages sent at once from the same room can't interleave their histories.
+
+CONVERSATION_MAX_ENTRIES = int(os.getenv("CONVERSATION_MAX_ENTRIES", "10000"))
+CONVERSATION_TTL_SECONDS = int(os.getenv("CONVERSATION_TTL_SECONDS", "86400"))
+CONVERSATION_MAX_BYTES = int(os.getenv("CONVERSATION_MAX_BYTES", str(100 * 1024 * 1024)))
+CONVERSATION_MAX_MESSAGES = int(os.getenv("CONVERSATION_MAX_MESSAGES", "200"))
+CONVERSATION_PERSIST = os.getenv("CONVERSATION_PERSIST", "0") == "1"
+
+# Expired rows are deleted every this many saves
+PURGE_EVERY_SAVES = 100
+
+
+def new_conversation_id():
+    return uuid.uuid4().hex
+
+
+def _messages_size(messages):
+    return sum(len(message.get("content") or "") for message in messages)
+
+
+class ConversationStore:
+    def __init__(self, max_entries=CONVERSATION_MAX_ENTRIES, ttl=CONVERSATION_TTL_SECONDS,
+                 max_bytes=CONVERSATION_MAX_BYTES, max_messages=CONVERSATION_MAX_MESSAGES,
+                 persist=CONVERSATION_PERSIST):
+        self.ttl = ttl
+        self.max_messages = max_messages
+        self.persist = persist
+        self.cache = SessionCache(max_entries=max_entries, idle_ttl=ttl, max_bytes=max_bytes,
+                                  size_fn=_messages_size)
+        self._locks = {}  # conversation id -> [lock, holders and waiters]
+        self._locks_lock = threading.Lock()
+        self._saves = 0
+
+    @contextmanager
+    def lock(self, conversation_id):
+        """Serializes turns of one conversation. Lock entries only live while in use."""
+        with self._locks_lock:
+            entry = self._locks.setdefault(conversation_id, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._locks_lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[conversation_id]
+
+    def get(self, conversation_id):
+        """Messages so far, oldest first ([] for an unknown or expired conversation)."""
+        messages = self.cache.get(conversation_id)
+        if messages is None and self.persist:
+            messages = self._load(conversation_id)
+            if messages is not None:
+                self.cache.put(conversation_id, messages)
+        return list(messages or [])
+
+    def append(self, conversation_id, *new_messages):
+        """Adds messages to a conversation; call while holding its lock."""
+        messages = (self.get(conversation_id) + list(new_messages))[-self.max_messages:]
+        self.cache.put(conversation_id, messages)
+        if self.persist:
+            self._save(conversation_id, messages)
+        return messages
+
+    def stats(self):
+        return {**self.cache.stats(), "persist": self.persist}
+
+    # --- SQLite persistence ---
+
+    def _load(self, conversation_id):
+        db = SessionLocal()
+        try:
+            row = db.get(Conversation, conversation_id)
+            if row is None or row.updated_at < datetime.utcnow() - timedelta(seconds=self.ttl):
+                return None
+            return row.messages
+        finally:
+            db.close()
+
+    def _save(self, conversation_id, messages):
+        db = SessionLocal()
+        try:
+            db.merge(Conversation(id=conversation_id, messages=messages, updated_at=datetime.utcnow()))
+            self._saves += 1
+            if self._saves % PURGE_EVERY_SAVES == 0:
+                cutoff = datetime.utcnow() - timedelta(seconds=self.ttl)
+                db.query(Conversation).filter(Conversation.updated_at < cutoff).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
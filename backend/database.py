@@ -1,14 +1,89 @@
-from sqlalchemy import create_engine
+import os
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./resort.db"
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./resort.db")
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+# --- Engine Tuning ---
+# SQLite pragmas are applied to every new connection. WAL lets dashboard reads
+# proceed while a chat turn is writing, and busy_timeout makes a writer wait for
+# the lock instead of failing with "database is locked". SQLITE_PRAGMAS=0 keeps
+# SQLite's defaults. Pool settings apply to file databases and server databases
+# (e.g. DATABASE_URL=postgresql+psycopg://...).
+SQLITE_PRAGMAS = os.getenv("SQLITE_PRAGMAS", "1") != "0"
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")  # Negative means KiB, not pages
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.close()
+
+def _engine_options(url, pool_size, max_overflow):
+    is_sqlite = url.startswith("sqlite")
+    kwargs = {}
+    if is_sqlite:
+        kwargs["connect_args"] = {"check_same_thread": False}
+    # In-memory SQLite uses a single-connection pool that takes no sizing options
+    in_memory = is_sqlite and (":memory:" in url or url.split("://")[-1].strip("/") == "")
+    if pool_size is not None and not in_memory:
+        kwargs.update(pool_size=pool_size, max_overflow=max_overflow,
+                      pool_timeout=DB_POOL_TIMEOUT, pool_recycle=DB_POOL_RECYCLE)
+        if not is_sqlite:
+            kwargs["pool_pre_ping"] = True  # Server connections can be dropped while idle
+    return kwargs
+
+def make_engine(url, pragmas=SQLITE_PRAGMAS, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW):
+    """
+    Creates an engine for `url`. pool_size=None keeps SQLAlchemy's default pool,
+    and pragmas=False leaves SQLite connections untuned (used by the benchmark
+    as the baseline).
+    """
+    engine = create_engine(url, **_engine_options(url, pool_size, max_overflow))
+    if url.startswith("sqlite") and pragmas:
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+def make_async_engine(url, pragmas=SQLITE_PRAGMAS, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW):
+    engine = create_async_engine(url, **_engine_options(url, pool_size, max_overflow))
+    if url.startswith("sqlite") and pragmas:
+        event.listen(engine.sync_engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+def to_async_url(url):
+    """Same database through an async driver: aiosqlite for SQLite, asyncpg for Postgres."""
+    scheme, rest = url.split(":", 1)
+    if scheme.startswith("sqlite"):
+        return "sqlite+aiosqlite:" + rest
+    if scheme.startswith("postgresql"):
+        return "postgresql+asyncpg:" + rest
+    return url
+
+engine = make_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# --- Async Engine ---
+# Used by the async API endpoints so queries don't hold a threadpool worker.
+# The sync engine above stays for the seeding scripts, init_db and the chat tools.
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", to_async_url(SQLALCHEMY_DATABASE_URL))
+async_engine = make_async_engine(ASYNC_DATABASE_URL)
+# Rows stay readable after commit, so handlers can return them without a reload
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 def get_db():
@@ -17,3 +92,41 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def init_db():
+    """Creates missing tables, and indexes added to models after their table was created."""
+    from . import models  # noqa: F401  (registers the tables on Base)
+    Base.metadata.create_all(bind=engine)
+    _add_updated_at_columns()
+    _add_reservation_columns()
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+def _add_updated_at_columns():
+    # Databases created before updated_at existed: add it and backfill from created_at
+    existing = inspect(engine)
+    with engine.begin() as conn:
+        for table in ("orders", "service_requests"):
+            columns = {column["name"] for column in existing.get_columns(table)}
+            if "updated_at" not in columns:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN updated_at TIMESTAMP"))
+                conn.execute(text(f"UPDATE {table} SET updated_at = created_at WHERE updated_at IS NULL"))
+
+def _add_reservation_columns():
+    # Databases whose rooms/bookings tables predate holds and optimistic claims
+    existing = inspect(engine)
+    added = {
+        "rooms": [("version", "INTEGER NOT NULL DEFAULT 0")],
+        "bookings": [("reference", "VARCHAR"), ("hold_expires_at", "TIMESTAMP")],
+    }
+    with engine.begin() as conn:
+        for table, new_columns in added.items():
+            columns = {column["name"] for column in existing.get_columns(table)}
+            for name, ddl in new_columns:
+                if name not in columns:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+from collections import deque
+from datetime import datetime
+
+# --- In-process Event Bus ---
+# Tools and API handlers publish order / service-request changes here after
+# they commit; the /events endpoint fans them out to connected dashboards as
+# Server-Sent Events. The last EVENT_HISTORY events are kept so a reconnecting
+# client can replay what it missed from its Last-Event-ID.
+#
+# Event types: order.created, order.updated, request.created, request.updated
+
+EVENT_HISTORY = 1000
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+
+def serialize(row):
+    """Column values of an ORM row as JSON-friendly data."""
+    data = {}
+    for column in row.__table__.columns:
+        value = getattr(row, column.name)
+        data[column.name] = value.isoformat() if isinstance(value, datetime) else value
+    return data
+
+
+class Subscription:
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def deliver(self, event):
+        # Runs on the subscriber's event loop
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too slow to keep up; the endpoint tells the client to resync
+            self.overflowed = True
+
+
+class EventBus:
+    def __init__(self, history=EVENT_HISTORY):
+        self._lock = threading.Lock()
+        self._events = deque(maxlen=history)
+        self._next_id = 1
+        self._subscribers = set()
+
+    def publish(self, event_type, data):
+        """Safe to call from any thread."""
+        with self._lock:
+            event = {"id": self._next_id, "type": event_type, "data": data}
+            self._next_id += 1
+            self._events.append(event)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+        return event
+
+    def subscribe(self, last_event_id=None):
+        """
+        Registers a subscriber on the running event loop.
+        Returns (subscription, replay), where replay is the buffered events after
+        last_event_id, or None if they are no longer all available (client must resync).
+        """
+        subscription = Subscription(asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.add(subscription)
+            if last_event_id is None:
+                return subscription, []
+            oldest = self._events[0]["id"] if self._events else self._next_id
+            # Ids restart with the process, so an id from the future also means "resync"
+            if last_event_id + 1 < oldest or last_event_id >= self._next_id:
+                return subscription, None
+            return subscription, [event for event in self._events if event["id"] > last_event_id]
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def stats(self):
+        with self._lock:
+            return {"subscribers": len(self._subscribers), "last_event_id": self._next_id - 1}
+
+
+event_bus = EventBus()
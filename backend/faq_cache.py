@@ -0,0 +1,249 @@
+import difflib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from .tools import facility_version
+
+# --- FAQ Answer Cache ---
+# Check-in times, Wi-Fi, parking and pool hours are asked over and over, and
+# each answer costs a route, an agent model call and a facility lookup. When a
+# receptionist turn is answered only from get_facility_info, the question and
+# the tool output are remembered here. Later questions that say the same thing
+# are answered from memory before routing, with no model call.
+#
+# Questions are compared as normalized content words (lowercase, punctuation
+# and filler words like "what", "the", "please" removed). An exact match is a
+# dict lookup; otherwise the most similar cached question by character-trigram
+# overlap (Dice coefficient, found through a trigram index) is used if it scores
+# at least FAQ_SIMILARITY_THRESHOLD *and* every word pairs with a near-identical
+# word in the other question. The second check tolerates typos and word order
+# but keeps "check in" from matching "check out" and "gym hours" from matching
+# "pool hours".
+#
+# Answers expire after FAQ_CACHE_TTL_SECONDS, and everything is dropped when
+# the facility data changes (tools.update_facility).
+
+FAQ_CACHE_ENABLED = os.getenv("FAQ_CACHE_ENABLED", "1") == "1"
+FAQ_CACHE_TTL_SECONDS = float(os.getenv("FAQ_CACHE_TTL_SECONDS", "3600"))
+FAQ_CACHE_MAX_ENTRIES = int(os.getenv("FAQ_CACHE_MAX_ENTRIES", "1000"))
+FAQ_SIMILARITY_THRESHOLD = float(os.getenv("FAQ_SIMILARITY_THRESHOLD", "0.85"))
+# Longer messages usually carry more than a question (orders, complaints)
+FAQ_MAX_QUESTION_WORDS = int(os.getenv("FAQ_MAX_QUESTION_WORDS", "8"))
+
+# Tools whose output depends only on the facility data, not on the guest or the moment
+FAQ_TOOLS = {"get_facility_info"}
+
+# Words two questions must pair up at, for a fuzzy match
+WORD_MATCH_RATIO = 0.8
+
+FILLER_WORDS = {
+    "a", "an", "the", "is", "are", "was", "be", "what", "whats", "s", "when", "where", "which", "how",
+    "do", "does", "can", "could", "would", "will", "i", "we", "you", "me", "my", "our", "your", "please",
+    "tell", "know", "about", "there", "any", "hi", "hello", "hey", "thanks", "thank", "of", "for", "to",
+    "at", "it", "time", "times", "timing", "timings", "hour", "hours", "info", "information",
+}
+PHRASES = [(re.compile(r"\bcheck[\s-]*in\b"), "checkin"), (re.compile(r"\bcheck[\s-]*out\b"), "checkout"),
+           (re.compile(r"\bwi[\s-]*fi\b"), "wifi")]
+
+
+def question_key(text):
+    """The content words of a question, space separated ("" if nothing is left)."""
+    text = text.lower()
+    for pattern, replacement in PHRASES:
+        text = pattern.sub(replacement, text)
+    words = re.sub(r"[^a-z0-9]+", " ", text).split()
+    return " ".join(word for word in words if word not in FILLER_WORDS)
+
+
+def _trigrams(key):
+    padded = f" {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _words_pair_up(a, b):
+    """Every word of each question has a near-identical word in the other."""
+    def covered(words, others):
+        return all(word in others or any(
+            difflib.SequenceMatcher(None, word, other).ratio() >= WORD_MATCH_RATIO for other in others
+        ) for word in words)
+
+    a_words, b_words = set(a.split()), set(b.split())
+    return covered(a_words, b_words) and covered(b_words, a_words)
+
+
+# --- Which tools a turn used ---
+
+class _TurnTools:
+    def __init__(self):
+        self.version = facility_version()  # Data the answers were built from
+        self.calls = []  # (tool name, result)
+
+
+_turn_tools = ContextVar("faq_turn_tools", default=None)
+
+
+@contextmanager
+def tracking_tool_calls():
+    """Collects the tool calls made in this context (tool threads included, see submit_in_context)."""
+    turn = _TurnTools()
+    token = _turn_tools.set(turn)
+    try:
+        yield turn
+    finally:
+        _turn_tools.reset(token)
+
+
+def note_tool_call(name, result):
+    turn = _turn_tools.get()
+    if turn is not None:
+        turn.calls.append((name, result))  # list.append is atomic; tool threads call this too
+
+
+class _Entry:
+    def __init__(self, answer, trigrams):
+        self.answer = answer
+        self.trigrams = trigrams
+        self.stored = time.monotonic()
+
+
+class FaqCache:
+    def __init__(self, enabled=FAQ_CACHE_ENABLED, ttl=FAQ_CACHE_TTL_SECONDS, max_entries=FAQ_CACHE_MAX_ENTRIES,
+                 threshold=FAQ_SIMILARITY_THRESHOLD, max_words=FAQ_MAX_QUESTION_WORDS):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.max_words = max_words
+        self._entries = OrderedDict()  # question key -> _Entry, oldest first
+        self._index = {}  # trigram -> question keys containing it
+        self._version = facility_version()
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.invalidations = 0
+        self._lookup_seconds = 0.0
+
+    def _cacheable(self, key):
+        # Digits mean a room number or a quantity: about this guest, not a FAQ
+        return key and len(key.split()) <= self.max_words and not re.search(r"\d", key)
+
+    def lookup(self, text):
+        """The cached answer to a question like this one, or None."""
+        if not self.enabled:
+            return None
+        start = time.perf_counter()
+        key = question_key(text)
+        with self._lock:
+            self._check_version()
+            answer = None
+            if self._cacheable(key):
+                entry = self._entries.get(key)
+                if entry is not None and self._fresh(key, entry):
+                    self.exact_hits += 1
+                    answer = entry.answer
+                else:
+                    match = self._most_similar(key)
+                    if match is not None:
+                        self.similar_hits += 1
+                        answer = self._entries[match].answer
+            if answer is None:
+                self.misses += 1
+            self._lookup_seconds += time.perf_counter() - start
+            return answer
+
+    def learn(self, text, turn):
+        """Remembers a turn's answer if it came only from FAQ tools that succeeded. Returns whether it did."""
+        if not self.enabled or not turn.calls:
+            return False
+        if any(name not in FAQ_TOOLS or str(result).startswith("Error") for name, result in turn.calls):
+            return False
+        key = question_key(text)
+        if not self._cacheable(key):
+            return False
+        answer = "\n\n".join(str(result) for _, result in turn.calls)
+        with self._lock:
+            self._check_version()
+            if turn.version != self._version:
+                return False  # Built from facility data that has changed since
+            self._remove(key)
+            self._entries[key] = _Entry(answer, _trigrams(key))
+            for gram in self._entries[key].trigrams:
+                self._index.setdefault(gram, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+            self.stored += 1
+            return True
+
+    def invalidate(self):
+        with self._lock:
+            self._clear()
+
+    def _most_similar(self, key):
+        grams = _trigrams(key)
+        shared = {}
+        for gram in grams:
+            for candidate in self._index.get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        # Best first; the word check rejects near-misses that differ in a key word
+        ranked = sorted(
+            ((2 * count / (len(grams) + len(self._entries[candidate].trigrams)), candidate)
+             for candidate, count in shared.items()),
+            reverse=True,
+        )
+        for score, candidate in ranked:
+            if score < self.threshold:
+                break
+            if self._fresh(candidate, self._entries[candidate]) and _words_pair_up(key, candidate):
+                return candidate
+        return None
+
+    def _fresh(self, key, entry):
+        if time.monotonic() - entry.stored <= self.ttl:
+            return True
+        self._remove(key)
+        return False
+
+    def _check_version(self):
+        current = facility_version()
+        if current != self._version:
+            self._clear()
+            self._version = current
+
+    def _clear(self):
+        self._entries.clear()
+        self._index.clear()
+        self.invalidations += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for gram in entry.trigrams:
+            keys = self._index.get(gram)
+            keys.discard(key)
+            if not keys:
+                del self._index[gram]
+
+    def stats(self):
+        with self._lock:
+            hits = self.exact_hits + self.similar_hits
+            lookups = hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "lookups": lookups,
+                "hits": hits,
+                "exact_hits": self.exact_hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_ratio": hits / lookups if lookups else 0.0,
+                "stored": self.stored,
+                "invalidations": self.invalidations,
+                "avg_lookup_us": self._lookup_seconds / lookups * 1e6 if lookups else 0.0,
+            }
@@ -0,0 +1,166 @@
+import hashlib
+import os
+import re
+from .session_cache import SessionCache
+
+# --- Conversation History Builder ---
+# Turns the history a client posts into the opening contents of a new chat
+# session, so an agent that joins a conversation (or a session rebuilt after
+# eviction) knows what was already said. The last HISTORY_RECENT_MESSAGES
+# messages are kept verbatim; older ones are folded into a short summary of
+# extracted facts (room number, guest name, orders and requests already made).
+# The result is kept under HISTORY_TOKEN_BUDGET by folding more messages into
+# the summary. The folded prefix is cached per conversation, so each turn only
+# processes the messages added since the last one.
+
+HISTORY_RECENT_MESSAGES = int(os.getenv("HISTORY_RECENT_MESSAGES", "6"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+HISTORY_CACHE_ENTRIES = int(os.getenv("HISTORY_CACHE_ENTRIES", "1000"))
+HISTORY_CACHE_TTL_SECONDS = int(os.getenv("HISTORY_CACHE_TTL_SECONDS", "1800"))
+
+ROOM_PATTERN = re.compile(r"\broom\s*(?:number\s*)?(?:is\s*|no\.?\s*|#\s*)?(\d{3,4})\b", re.IGNORECASE)
+BARE_ROOM_PATTERN = re.compile(r"^\D*(\d{3,4})\D*$")
+NAME_PATTERN = re.compile(r"\bmy name is ([A-Z][a-z]+(?: [A-Z][a-z]+)?)")
+ORDER_PATTERN = re.compile(r"Order ID: (\d+)\. Total Bill: ₹(\d+(?:\.\d+)?)")
+REQUEST_PATTERN = re.compile(r"Request ID: (\d+)")
+
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English text
+    return len(text) // 4 + 1
+
+
+def message_role(message):
+    return "user" if message.get("role") == "user" else "model"
+
+
+class Facts:
+    """What the guest has told us, or we have done for them, in messages no longer sent verbatim."""
+
+    def __init__(self):
+        self.room_number = None
+        self.guest_name = None
+        self.orders = []
+        self.requests = []
+
+    def update(self, message):
+        text = message.get("content") or ""
+        if message_role(message) == "user":
+            match = ROOM_PATTERN.search(text) or BARE_ROOM_PATTERN.match(text)
+            if match:
+                self.room_number = match.group(1)
+            match = NAME_PATTERN.search(text)
+            if match:
+                self.guest_name = match.group(1)
+        else:
+            self.orders += [f"#{order_id} (₹{float(total):g})" for order_id, total in ORDER_PATTERN.findall(text)]
+            self.requests += [f"#{request_id}" for request_id in REQUEST_PATTERN.findall(text)]
+
+    def summary(self):
+        facts = []
+        if self.guest_name:
+            facts.append(f"Guest name: {self.guest_name}")
+        if self.room_number:
+            facts.append(f"Room number: {self.room_number}")
+        if self.orders:
+            facts.append(f"Orders placed (pending): {', '.join(self.orders[-5:])}")
+        if self.requests:
+            facts.append(f"Service requests made: {', '.join(self.requests[-5:])}")
+        if not facts:
+            return ""
+        return "Earlier in this conversation: " + "; ".join(facts) + "."
+
+    def copy(self):
+        facts = Facts()
+        facts.room_number, facts.guest_name = self.room_number, self.guest_name
+        facts.orders, facts.requests = list(self.orders), list(self.requests)
+        return facts
+
+
+def _fingerprint(message):
+    return hashlib.sha1(f"{message.get('role')}\0{message.get('content')}".encode()).hexdigest()
+
+
+class _Folded:
+    """Per-conversation cache entry: the facts from messages[:count]."""
+
+    def __init__(self):
+        self.count = 0
+        self.last = None  # Fingerprint of messages[count - 1], to notice an edited history
+        self.facts = Facts()
+
+
+class HistoryBuilder:
+    def __init__(self, recent_messages=HISTORY_RECENT_MESSAGES, token_budget=HISTORY_TOKEN_BUDGET):
+        self.recent_messages = recent_messages
+        self.token_budget = token_budget
+        self.cache = SessionCache(max_entries=HISTORY_CACHE_ENTRIES, idle_ttl=HISTORY_CACHE_TTL_SECONDS)
+
+    def _folded(self, messages, conversation_id):
+        folded = self.cache.get(conversation_id) if conversation_id else None
+        if folded is None or folded.count > len(messages) or (
+                folded.count and _fingerprint(messages[folded.count - 1]) != folded.last):
+            folded = _Folded()
+        return folded
+
+    def build(self, history, conversation_id=None):
+        """
+        Returns [(role, text)] for the messages before the current one, roles
+        alternating "user"/"model" and ending with "model", within the token budget.
+        """
+        messages = [m for m in history if m.get("content")]
+        folded = self._folded(messages, conversation_id)
+
+        # Fold everything older than the verbatim window into the facts
+        start = max(folded.count, len(messages) - self.recent_messages)
+        facts = folded.facts.copy()
+        for message in messages[folded.count:start]:
+            facts.update(message)
+
+        recent = messages[start:]
+        summary = facts.summary()
+        kept = self._fit(recent, estimate_tokens(summary) if summary else 0)
+        for message in recent[:len(recent) - len(kept)]:
+            facts.update(message)
+            start += 1
+        summary = facts.summary()
+
+        if conversation_id and start > folded.count:
+            entry = _Folded()
+            entry.count, entry.last, entry.facts = start, _fingerprint(messages[start - 1]), facts
+            self.cache.put(conversation_id, entry)
+
+        contents = [("user", summary), ("model", "Noted.")] if summary else []
+        return _alternating(contents + [(message_role(m), m["content"]) for m in kept])
+
+    def recent_contents(self, history):
+        """Like build, without the summary: the newest messages that fit the budget."""
+        messages = [m for m in history if m.get("content")]
+        return _alternating([(message_role(m), m["content"]) for m in self._fit(messages)])
+
+    def _fit(self, messages, used=0):
+        """The newest messages that fit in the token budget alongside `used` tokens."""
+        kept = []
+        for message in reversed(messages):
+            used += estimate_tokens(message["content"])
+            if used > self.token_budget:
+                break
+            kept.append(message)
+        kept.reverse()
+        return kept
+
+
+def _alternating(contents):
+    merged = []
+    for role, text in contents:
+        if merged and merged[-1][0] == role:
+            # The API expects alternating roles; merge runs of the same speaker
+            merged[-1] = (role, merged[-1][1] + "\n\n" + text)
+        else:
+            merged.append((role, text))
+    # Start with the guest, end with the model: the next message sent is the guest's
+    while merged and merged[0][0] != "user":
+        merged.pop(0)
+    while merged and merged[-1][0] != "model":
+        merged.pop()
+    return merged
@@ -0,0 +1,180 @@
+import logging
+import re
+import threading
+import time
+from .menu_catalog import menu_catalog, menu_version
+
+logger = logging.getLogger(__name__)
+
+# --- Local Intent Classifier ---
+# Keyword/phrase table mirroring the duties listed in the agent system prompts,
+# plus the dish names from the menu_items table. Obvious messages ("menu",
+# "towels", "wifi", "order 2 dosa") are routed without an LLM call; anything
+# scoring below the confidence threshold falls back to the LLM router.
+# Dish names are reloaded whenever the menu catalog's version moves on.
+
+STRONG = 2.0
+WEAK = 1.0
+
+# Wait before retrying a menu load that failed (e.g. the database was down)
+MENU_RETRY_SECONDS = 30
+
+KEYWORDS = {
+    "Receptionist": {
+        # RECEPTIONIST_PROMPT: FAQs, room availability, facility info
+        "check-in": STRONG, "check in": STRONG, "checkin": STRONG,
+        "check-out": STRONG, "check out": STRONG, "checkout": STRONG,
+        "wifi": STRONG, "wi-fi": STRONG, "internet": STRONG, "password": WEAK,
+        "parking": STRONG, "park": WEAK, "valet": STRONG,
+        "availability": STRONG, "available": WEAK, "vacancy": STRONG,
+        "book": WEAK, "booking": WEAK, "reservation": WEAK, "reserve": WEAK,
+        "deluxe": STRONG, "suite": STRONG, "standard room": STRONG,
+        "gym": STRONG, "spa": STRONG, "pool": STRONG, "swimming": STRONG, "massage": STRONG,
+        "facility": STRONG, "facilities": STRONG, "timings": WEAK, "hours": WEAK, "open": WEAK,
+    },
+    "Restaurant": {
+        # RESTAURANT_PROMPT: show the menu, take food orders
+        "menu": STRONG, "food": STRONG, "eat": STRONG, "hungry": STRONG, "dish": STRONG,
+        "breakfast": STRONG, "lunch": STRONG, "dinner": STRONG, "snack": STRONG,
+        "dessert": STRONG, "drink": WEAK, "beverage": WEAK, "veg": WEAK, "non-veg": STRONG,
+        "order": WEAK, "bill": WEAK,
+    },
+    "RoomService": {
+        # ROOM_SERVICE_PROMPT: cleaning, laundry, amenities
+        "room service": STRONG, "housekeeping": STRONG,
+        "clean": STRONG, "cleaning": STRONG, "laundry": STRONG, "iron": WEAK,
+        "towel": STRONG, "soap": STRONG, "shampoo": STRONG, "toiletries": STRONG, "amenities": STRONG,
+        "pillow": STRONG, "blanket": STRONG, "bedsheet": STRONG, "sheets": WEAK,
+        "repair": STRONG, "broken": STRONG, "not working": STRONG, "leak": STRONG, "ac": WEAK,
+    },
+}
+
+# Words in dish names too generic to signal a food order on their own
+GENERIC_MENU_WORDS = {"plain", "fresh", "with", "and", "special", "soft", "hot", "cold", "sweet"}
+
+# Smoothing in the confidence ratio, so a single weak keyword never clears the threshold
+SMOOTHING = 1.0
+
+
+def normalize(text):
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s-]", " ", text.lower())).strip()
+
+
+def _singular(word):
+    if len(word) > 3 and word.endswith("es") and word[-3] in "sxz":
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+class IntentClassifier:
+    def __init__(self, keywords=KEYWORDS):
+        self._base_keywords = {label: dict(terms) for label, terms in keywords.items()}
+        self.keywords = {label: dict(terms) for label, terms in keywords.items()}
+        self._menu_version = None  # Menu version the dish keywords were built from
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+
+    def load_menu_terms(self):
+        """
+        Rebuilds the keywords with the current dish names and menu categories as
+        strong Restaurant keywords, and their words as weak ones. Returns False, leaving the keywords as they were, if
+        the menu couldn't be read or is empty.
+        """
+        try:
+            rows = [(item.name, item.category) for item in menu_catalog.items()]
+        except Exception as e:
+            logger.warning("Intent classifier could not load menu terms: %s", e)
+            return False
+        if not rows:
+            # Probably not seeded yet: have the catalog re-read the table on the retry
+            logger.warning("Intent classifier found no menu items")
+            menu_catalog.invalidate()
+            return False
+
+        keywords = {label: dict(terms) for label, terms in self._base_keywords.items()}
+        terms = keywords["Restaurant"]
+        for name, category in rows:
+            for phrase in (name, category):
+                if not phrase:
+                    continue
+                phrase = normalize(phrase)
+                terms[phrase] = STRONG
+                # Single words of a longer name ("water", "ice", "green") also turn up in
+                # other requests, so on their own they leave the decision to the LLM router
+                for word in phrase.split():
+                    if word not in GENERIC_MENU_WORDS and len(word) > 2:
+                        terms.setdefault(word, WEAK)
+        # Swap in the complete table so a concurrent scores() never sees a half-built one
+        self.keywords = keywords
+        return True
+
+    def _ensure_menu(self):
+        if self._menu_version == menu_version() or time.monotonic() < self._retry_at:
+            return
+        with self._lock:
+            # Read before loading, so a change during the load triggers another one
+            version = menu_version()
+            if self._menu_version == version:
+                return
+            if self.load_menu_terms():
+                self._menu_version = version
+            else:
+                self._retry_at = time.monotonic() + MENU_RETRY_SECONDS
+
+    def scores(self, text):
+        self._ensure_menu()
+        text = normalize(text)
+        words = set(text.split())
+        words |= {_singular(w) for w in words}
+        padded = f" {text} "
+
+        scores = {}
+        for label, terms in self.keywords.items():
+            score = 0.0
+            for term, weight in terms.items():
+                if (" " in term and f" {term} " in padded) or term in words:
+                    score += weight
+            scores[label] = score
+        return scores
+
+    def classify(self, text):
+        """
+        Returns (label, confidence). Label is None when no keyword matched.
+        Confidence is the winning score's share of all matched weight.
+        """
+        scores = self.scores(text)
+        label = max(scores, key=scores.get)
+        top = scores[label]
+        if top == 0:
+            return None, 0.0
+        return label, top / (sum(scores.values()) + SMOOTHING)
+
+
+class RoutingStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.fast_path = 0
+        self.llm_fallback = 0
+        self.by_label = {}
+
+    def record(self, path, label):
+        with self._lock:
+            if path == "fast_path":
+                self.fast_path += 1
+            else:
+                self.llm_fallback += 1
+            self.by_label[label] = self.by_label.get(label, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            total = self.fast_path + self.llm_fallback
+            return {
+                "total": total,
+                "fast_path": self.fast_path,
+                "llm_fallback": self.llm_fallback,
+                "fast_path_rate": self.fast_path / total if total else 0.0,
+                "fallback_rate": self.llm_fallback / total if total else 0.0,
+                "by_label": dict(self.by_label),
+            }
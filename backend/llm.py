@@ -0,0 +1,341 @@
+import inspect
+import logging
+import os
+import re
+import time
+from .history import estimate_tokens
+
+# --- LLM Provider Interface ---
+# Agents and the router talk to the model through these small wrappers instead
+# of the Gemini SDK directly, so the backend can be swapped by environment:
+#
+#   LLM_BACKEND=gemini  (default) Google Gemini via google-generativeai
+#   LLM_BACKEND=stub    deterministic local stand-in, no network or API key
+#
+# The stub exists for load tests and benchmarks: it picks tools and writes
+# replies with simple rules, and sleeps LLM_STUB_LATENCY_MS per call (plus
+# LLM_STUB_TOKEN_MS per streamed chunk) to imitate model latency.
+
+MODEL_NAME = 'gemini-2.0-flash-exp' # Using Flash for speed/cost
+
+logger = logging.getLogger(__name__)
+
+
+class FunctionCall:
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __repr__(self):
+        return f"FunctionCall({self.name!r}, {self.args!r})"
+
+
+class FunctionResult:
+    def __init__(self, name, result):
+        self.name = name
+        self.result = result
+
+
+class Usage:
+    """Tokens billed for one model call: as reported by the API, estimated by the stub."""
+
+    def __init__(self, prompt_tokens=0, output_tokens=0):
+        self.prompt_tokens = prompt_tokens
+        self.output_tokens = output_tokens
+
+
+class LLMResponse:
+    """
+    A model reply (or one streamed chunk of it): text and/or function calls.
+    usage is None when unknown; when streaming, the last chunk carries the call's totals.
+    """
+
+    def __init__(self, text="", function_calls=None, blocked_reason=None, usage=None):
+        self.text = text
+        self.function_calls = function_calls or []
+        self.blocked_reason = blocked_reason
+        self.usage = usage
+
+
+class LLMProvider:
+    name = "base"
+
+    def create_model(self, system_instruction, tools=None):
+        """Returns a model with generate(text) and start_chat(history=None)."""
+        raise NotImplementedError
+
+
+# --- Gemini ---
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+
+    def __init__(self, api_key=None, model_name=MODEL_NAME):
+        import google.generativeai as genai
+        if not api_key:
+            logger.critical("API key is not set!")
+        genai.configure(api_key=api_key)
+        self.genai = genai
+        self.model_name = model_name
+
+    def create_model(self, system_instruction, tools=None):
+        model = self.genai.GenerativeModel(
+            model_name=self.model_name,
+            tools=tools,
+            system_instruction=system_instruction
+        )
+        return GeminiModel(self.genai, model)
+
+
+class GeminiModel:
+    def __init__(self, genai, model):
+        self.genai = genai
+        self.model = model
+
+    def generate(self, text):
+        return _from_gemini(self.model.generate_content(text))
+
+    def start_chat(self, history=None):
+        """history: optional [(role, text)] to open the session with, roles "user"/"model"."""
+        protos = self.genai.protos
+        contents = [protos.Content(role=role, parts=[protos.Part(text=text)]) for role, text in history or []]
+        return GeminiChat(self.genai, self.model.start_chat(history=contents, enable_automatic_function_calling=False))
+
+
+class GeminiChat:
+    def __init__(self, genai, chat_session):
+        self.genai = genai
+        self.chat_session = chat_session
+
+    def _content(self, message):
+        if isinstance(message, str):
+            return message
+        return self.genai.protos.Content(
+            parts=[self.genai.protos.Part(
+                function_response=self.genai.protos.FunctionResponse(
+                    name=result.name,
+                    response={"result": result.result}
+                )
+            ) for result in message]
+        )
+
+    def send(self, message):
+        """Sends user text, or a list of FunctionResult, and returns the reply."""
+        return _from_gemini(self.chat_session.send_message(self._content(message)))
+
+    def stream(self, message):
+        """Like send, but yields the reply chunk by chunk."""
+        for chunk in self.chat_session.send_message(self._content(message), stream=True):
+            yield _from_gemini(chunk)
+
+    def record(self, message, reply):
+        """Adds an exchange to the history without calling the model (e.g. a tool result shown as-is)."""
+        protos = self.genai.protos
+        content = self._content(message)
+        if isinstance(content, str):
+            content = protos.Content(parts=[protos.Part(text=content)])
+        content.role = "user"
+        self.chat_session.history.extend([content, protos.Content(role="model", parts=[protos.Part(text=reply)])])
+
+    def size(self):
+        """Approximate memory held by the session: the serialized size of its history."""
+        return sum(type(content).pb(content).ByteSize() for content in self.chat_session.history)
+
+
+def _from_gemini(response):
+    metadata = getattr(response, 'usage_metadata', None)
+    # Streamed chunks each report the running totals, so the last one holds the whole call
+    usage = Usage(metadata.prompt_token_count, metadata.candidates_token_count) if metadata else None
+    parts = response.parts
+    if not parts:
+        feedback = getattr(response, 'prompt_feedback', None)
+        return LLMResponse(blocked_reason=str(feedback) if feedback else None, usage=usage)
+
+    texts = []
+    function_calls = []
+    for part in parts:
+        if part.function_call:
+            fn = part.function_call
+            function_calls.append(FunctionCall(fn.name, dict(fn.args) if fn.args else {}))
+        elif part.text:
+            texts.append(part.text)
+    return LLMResponse("".join(texts), function_calls, usage=usage)
+
+
+# --- Offline Stub ---
+
+# Words too generic to tie a message to a particular tool
+STUB_STOPWORDS = {
+    "get", "create", "check", "place", "the", "a", "an", "of", "and", "or", "for", "to", "is",
+    "about", "returns", "retrieves", "from", "with", "e", "g", "etc", "optional", "type",
+    "args", "number", "guest", "items", "item", "name", "names", "dictionary", "quantities",
+}
+
+
+def _words(text):
+    return set(re.findall(r"[a-z]+", text.lower()))
+
+
+def _stem(word):
+    # Crude prefix stem so "available"/"availability" and "facility"/"facilities" meet
+    return word[:5]
+
+
+class StubProvider(LLMProvider):
+    name = "stub"
+
+    def __init__(self, latency_ms=0, token_ms=0):
+        self.latency = latency_ms / 1000
+        self.token_latency = token_ms / 1000
+
+    def create_model(self, system_instruction, tools=None):
+        return StubModel(self, system_instruction, tools or [])
+
+    def wait(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+class StubModel:
+    def __init__(self, provider, system_instruction, tools):
+        self.provider = provider
+        self.system_instruction = system_instruction
+        self.tools = tools
+        # Keyword sets per tool from its name and docstring, computed once like Gemini's schema
+        self.tool_keywords = {}
+        for tool in tools:
+            words = _words(tool.__name__.replace("_", " ") + " " + (inspect.getdoc(tool) or ""))
+            self.tool_keywords[tool.__name__] = {_stem(w) for w in words - STUB_STOPWORDS}
+        # Sent with every call: the system prompt and the tool declarations
+        self.base_tokens = estimate_tokens(system_instruction) + sum(
+            estimate_tokens(tool.__name__ + (inspect.getdoc(tool) or "")) for tool in tools)
+
+    def generate(self, text):
+        self.provider.wait(self.provider.latency)
+        # No classification ability: a router parsing this falls back to its default label
+        reply = f"Stub reply: {text}"
+        return LLMResponse(reply, usage=Usage(self.base_tokens + estimate_tokens(text), estimate_tokens(reply)))
+
+    def start_chat(self, history=None):
+        return StubChat(self, history)
+
+    def pick_tool(self, text):
+        words = {_stem(w) for w in _words(text)}
+        best, best_overlap = None, 0
+        for tool in self.tools:
+            overlap = len(words & self.tool_keywords[tool.__name__])
+            if overlap > best_overlap:
+                best, best_overlap = tool, overlap
+        if best is None and re.search(r"\b\d{3,4}\b", text):
+            # A bare room number goes to the first tool that takes one
+            best = next((t for t in self.tools if "room_number" in inspect.signature(t).parameters), None)
+        return best
+
+    def pick_tools(self, text):
+        """
+        One call per distinct tool across the message's sentences, so "Show me the
+        spa hours. Also send towels to 305" asks for two tools in one response.
+        Returns [(tool, the sentence that picked it)].
+        """
+        picked = {}
+        for part in re.split(r"[.;!?]\s+|\s+and also\s+", text):
+            tool = self.pick_tool(part)
+            if tool is not None and tool.__name__ not in picked:
+                picked[tool.__name__] = (tool, part)
+        if len(picked) <= 1:
+            tool = self.pick_tool(text)
+            return [(tool, text)] if tool else []
+        return list(picked.values())
+
+    def tool_args(self, tool, text, context=None):
+        args = {}
+        # "from 2025-03-14 to 2025-03-16": dates fill the *_date parameters in order
+        dates = re.findall(r"\b\d{4}-\d{2}-\d{2}\b", text) or re.findall(r"\b\d{4}-\d{2}-\d{2}\b", context or "")
+        for name, param in inspect.signature(tool).parameters.items():
+            if name.endswith("_date"):
+                if dates:
+                    args[name] = dates.pop(0)
+            elif name == "room_number":
+                # The room may be mentioned in another sentence of the message
+                match = re.search(r"\b\d{3,4}\b", text) or re.search(r"\b\d{3,4}\b", context or "")
+                args[name] = match.group(0) if match else "101"
+            elif param.annotation is dict:
+                # "2 masala dosa and 1 coffee" -> {"masala dosa": 2, "coffee": 1}
+                # (dates are taken out first, so "2025-03-14 to" isn't 14 of "to")
+                undated = re.sub(r"\b\d{4}-\d{2}-\d{2}\b", " ", text.lower())
+                items = re.findall(r"(\d+)\s+([a-z][a-z ]*?)(?=\s+and\b|,|$|\s+\d|\s+for\b|\s+from\b)", undated)
+                args[name] = {item.strip(): int(qty) for qty, item in items if int(qty) < 100}
+            elif param.default is inspect.Parameter.empty or param.default is None:
+                # Free-text arguments get the whole message; the tools do their own keyword matching
+                args[name] = text
+        return args
+
+
+class StubChat:
+    def __init__(self, model, history=None):
+        self.model = model
+        self.history = [text for _, text in history or []]
+
+    def _usage(self, message, reply):
+        """Estimated usage of a call; must run before the exchange is added to the history."""
+        # The model reads its instructions, the whole session so far and the new message
+        prompt = self.model.base_tokens + sum(estimate_tokens(str(item)) for item in self.history)
+        prompt += estimate_tokens(message if isinstance(message, str) else
+                                  "".join(str(result.result) for result in message))
+        output = estimate_tokens(reply.text + "".join(f"{fn.name}{fn.args}" for fn in reply.function_calls))
+        return Usage(prompt, output)
+
+    def _reply(self, message):
+        if isinstance(message, str):
+            picked = self.model.pick_tools(message)
+            if picked:
+                response = LLMResponse(function_calls=[
+                    FunctionCall(tool.__name__, self.model.tool_args(tool, part, message)) for tool, part in picked
+                ])
+            else:
+                response = LLMResponse("Thank you for your message. How else may I assist you?")
+        else:
+            # Echo tool output, as the prompts ask the model to do
+            response = LLMResponse("\n\n".join(str(result.result) for result in message))
+        response.usage = self._usage(message, response)
+        if isinstance(message, str):
+            self.history.append(message)
+        if not response.function_calls:
+            self.history.append(response.text)
+        return response
+
+    def send(self, message):
+        self.model.provider.wait(self.model.provider.latency)
+        return self._reply(message)
+
+    def stream(self, message):
+        provider = self.model.provider
+        provider.wait(provider.latency)
+        response = self._reply(message)
+        if response.function_calls:
+            yield response
+            return
+        tokens = re.findall(r"\S+\s*|\s+", response.text)
+        for i, token in enumerate(tokens):
+            provider.wait(provider.token_latency)
+            yield LLMResponse(token, usage=response.usage if i == len(tokens) - 1 else None)
+
+    def record(self, message, reply):
+        if isinstance(message, str):
+            self.history.append(message)
+        self.history.append(reply)
+
+    def size(self):
+        return sum(len(str(item)) for item in self.history)
+
+
+def get_provider():
+    backend = os.getenv("LLM_BACKEND", "gemini").lower()
+    if backend == "stub":
+        return StubProvider(
+            latency_ms=float(os.getenv("LLM_STUB_LATENCY_MS", "0")),
+            token_ms=float(os.getenv("LLM_STUB_TOKEN_MS", "0")),
+        )
+    if backend == "gemini":
+        return GeminiProvider(api_key=os.getenv("OPENAI_API_KEY")) # Keeping the env var name same for simplicity
+    raise ValueError(f"Unknown LLM_BACKEND '{backend}' (expected 'gemini' or 'stub')")
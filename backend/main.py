@@ -1,11 +1,32 @@
-from fastapi import FastAPI, HTTPException, Depends
+import asyncio
+import json
+import logging
+from datetime import datetime
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response, Header
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from .database import get_db
+from .database import get_db, get_async_db, init_db
 from .models import Order, ServiceRequest
-from .agents import manager
+from .agents import manager, overrun_tools
+from .conversations import new_conversation_id
+from .concurrency import chat_limiter, ChatOverloaded
+from .events import event_bus, serialize
+from .stats import stats_cache
+from .usage import usage_meter, usage_report
+from .observability import RequestTracingMiddleware, metrics, span, METRICS_ENABLED
+from .pagination import (
+    apply_filters, paginate_async, set_page_headers, changes_since_async, set_sync_headers,
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE,
+)
+
+init_db()
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Resort Agent System")
 
@@ -16,61 +37,308 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "X-Sync-Cursor", "X-Sync-More", "X-Request-ID"],
 )
+# Added last so it wraps everything else, CORS included
+app.add_middleware(RequestTracingMiddleware)
 
 # --- Schemas ---
 class ChatRequest(BaseModel):
-    history: List[Dict[str, str]] # List of {"role": "user", "content": "..."}
+    message: Optional[str] = None # The new guest message; the server keeps the conversation
+    conversation_id: Optional[str] = None # Returned by the first /chat call; omit to start a conversation
+    history: Optional[List[Dict[str, str]]] = None # Legacy: the whole conversation, sent instead of message
 
 class ChatResponse(BaseModel):
     response: str
+    conversation_id: Optional[str] = None
 
 class StatusUpdate(BaseModel):
     status: str
 
+class StatusChange(BaseModel):
+    id: int
+    status: str
+
 # --- Endpoints ---
 
+def chat_turn(request, streaming=False):
+    """Returns (turn function, its arguments, conversation id) for a chat request."""
+    if request.message is not None:
+        conversation_id = request.conversation_id or new_conversation_id()
+        turn = manager.stream_converse if streaming else manager.converse
+        return turn, (conversation_id, request.message), conversation_id
+    if request.history:
+        turn = manager.stream_history_turn if streaming else manager.history_turn
+        return turn, (request.history, request.conversation_id), request.conversation_id
+    raise HTTPException(status_code=422, detail="Send a message (or a history)")
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat_endpoint(request: ChatRequest):
+    turn, args, conversation_id = chat_turn(request)
     try:
-        response_text = manager.chat(request.history)
-        return {"response": response_text}
+        # Run the blocking turn on the chat executor so the event loop stays free
+        response_text = await chat_limiter.run(turn, *args)
+        return {"response": response_text, "conversation_id": conversation_id}
+    except ChatOverloaded as e:
+        raise HTTPException(status_code=503, detail=f"Chat is busy, please retry shortly ({e}).",
+                            headers={"Retry-After": "1"})
     except Exception as e:
-        import traceback
-        traceback.print_exc()
-        print(f"Error processing chat request: {e}")
+        logger.exception("Error processing chat request")
         raise HTTPException(status_code=500, detail=str(e))
 
+def sse_event(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """
+    Server-Sent Events version of /chat: a `conversation` event with the id to send
+    next time, a `route` event, `tool`/`tool_result` events around tool calls,
+    `token` events as the model produces text, then `done`.
+    """
+    turn_fn, args, conversation_id = chat_turn(request, streaming=True)
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def produce():
+        # Runs on the chat executor; hands each event back to the event loop
+        try:
+            for event in turn_fn(*args):
+                loop.call_soon_threadsafe(events.put_nowait, event)
+        except Exception as e:
+            logger.exception("Error processing chat stream")
+            loop.call_soon_threadsafe(events.put_nowait, {"type": "error", "detail": str(e)})
+        finally:
+            loop.call_soon_threadsafe(events.put_nowait, None)
+
+    try:
+        turn = chat_limiter.submit(produce)
+    except ChatOverloaded as e:
+        raise HTTPException(status_code=503, detail=f"Chat is busy, please retry shortly ({e}).",
+                            headers={"Retry-After": "1"})
+
+    async def event_stream():
+        if conversation_id:
+            yield sse_event({"type": "conversation", "conversation_id": conversation_id})
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            yield sse_event(event)
+        await turn
+        yield sse_event({"type": "done"})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/chat/stats")
+def get_chat_stats():
+    return {**chat_limiter.stats(), "sessions": manager.sessions.stats(),
+            "conversations": manager.conversations.stats(), "faq_cache": manager.faq_cache.stats()}
+
+@app.get("/routing/stats")
+def get_routing_stats():
+    return manager.routing_stats.snapshot()
+
+@app.get("/usage")
+def get_usage(
+    group_by: str = Query("agent", pattern="^(agent|tool|conversation|agent_tool)$"),
+    conversation_id: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+):
+    """LLM calls, prompt/output tokens, average latency and estimated cost per agent, tool or conversation."""
+    usage_meter.flush()  # Include calls not yet written
+    return usage_report(db, group_by, conversation_id, start, end, limit)
+
+# Point-in-time values, read when /metrics is scraped
+metrics.gauge("resort_chat_in_flight", "Chat turns running.", lambda: chat_limiter.in_flight)
+metrics.gauge("resort_chat_queued", "Chat turns waiting for a worker.", lambda: chat_limiter.queued)
+metrics.gauge("resort_chat_rejected", "Chat turns rejected since start because the queue was full.",
+              lambda: chat_limiter.rejected)
+metrics.gauge("resort_tools_overrun", "Timed-out tools still holding a tool pool thread.",
+              lambda: len(overrun_tools))
+metrics.gauge("resort_chat_sessions", "Cached agent chat sessions.", lambda: manager.sessions.stats()["entries"])
+metrics.gauge("resort_conversations", "Conversations held in memory.",
+              lambda: manager.conversations.stats()["entries"])
+metrics.gauge("resort_faq_cache_hit_ratio", "Share of FAQ cache lookups answered from the cache.",
+              lambda: manager.faq_cache.stats()["hit_ratio"])
+
+@app.get("/metrics")
+def get_metrics():
+    """Stage and request latency histograms and chat load, in the Prometheus text format."""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (METRICS_ENABLED=0)")
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# List endpoints return one newest-first page. The next page's cursor is in the
+# X-Next-Cursor header (absent on the last page); include_total=true adds X-Total-Count.
+# With ?since=<sync cursor> they instead return rows changed after the cursor
+# (see pagination.changes_since).
+
+async def list_rows(model, response, db, status, room, start, end, cursor, since, limit, include_total):
+    if since is not None:
+        if status or cursor or include_total:
+            # A row whose status moved out of the filter would never be reported as changed
+            raise HTTPException(status_code=400, detail="since cannot be combined with status, cursor or include_total")
+        stmt = apply_filters(select(model), model, room=room, start=start, end=end)
+        rows, new_cursor, has_more = await changes_since_async(db, stmt, model, since, limit)
+        set_sync_headers(response, new_cursor, has_more)
+        return rows
+
+    stmt = apply_filters(select(model), model, status, room, start, end)
+    rows, next_cursor, total = await paginate_async(db, stmt, model, cursor, limit, include_total)
+    set_page_headers(response, next_cursor, total)
+    return rows
+
 @app.get("/orders")
-def get_orders(db: Session = Depends(get_db)):
-    orders = db.query(Order).all()
-    return orders
+async def get_orders(
+    response: Response,
+    status: Optional[List[str]] = Query(None),
+    room: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    since: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    include_total: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+):
+    return await list_rows(Order, response, db, status, room, start, end, cursor, since, limit, include_total)
 
 @app.get("/requests")
-def get_requests(db: Session = Depends(get_db)):
-    requests = db.query(ServiceRequest).all()
-    return requests
+async def get_requests(
+    response: Response,
+    status: Optional[List[str]] = Query(None),
+    room: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    since: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    include_total: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+):
+    return await list_rows(ServiceRequest, response, db, status, room, start, end, cursor, since, limit, include_total)
+
+@app.get("/stats")
+def get_stats(
+    status: Optional[List[str]] = Query(None),
+    room: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+):
+    """Dashboard aggregates (counts, revenue, status/type breakdowns, top rooms), briefly cached."""
+    return stats_cache.get(db, status, room, start, end)
 
 @app.put("/orders/{order_id}")
-def update_order_status(order_id: int, status_update: StatusUpdate, db: Session = Depends(get_db)):
-    order = db.query(Order).filter(Order.id == order_id).first()
+async def update_order_status(order_id: int, status_update: StatusUpdate, db: AsyncSession = Depends(get_async_db)):
+    order = await db.get(Order, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     order.status = status_update.status
-    db.commit()
-    db.refresh(order)
+    with span("db_commit"):
+        await db.commit()  # The session keeps the row loaded after commit, updated_at included
+    event_bus.publish("order.updated", serialize(order))
     return order
 
 @app.put("/requests/{request_id}")
-def update_request_status(request_id: int, status_update: StatusUpdate, db: Session = Depends(get_db)):
-    service_request = db.query(ServiceRequest).filter(ServiceRequest.id == request_id).first()
+async def update_request_status(request_id: int, status_update: StatusUpdate, db: AsyncSession = Depends(get_async_db)):
+    service_request = await db.get(ServiceRequest, request_id)
     if not service_request:
         raise HTTPException(status_code=404, detail="Service request not found")
     service_request.status = status_update.status
-    db.commit()
-    db.refresh(service_request)
+    with span("db_commit"):
+        await db.commit()
+    event_bus.publish("request.updated", serialize(service_request))
     return service_request
 
+async def bulk_update_status(db, model, changes, event_type):
+    """
+    Applies a list of {id, status} changes in one transaction, with one
+    UPDATE ... WHERE id IN (...) per target status. Returns per-id results.
+    """
+    wanted = {change.id: change.status for change in changes}  # Last change per id wins
+    existing = set((await db.scalars(select(model.id).where(model.id.in_(wanted)))).all())
+
+    by_status = {}
+    for row_id in existing:
+        by_status.setdefault(wanted[row_id], []).append(row_id)
+
+    # Bulk UPDATE bypasses the ORM, so the onupdate hook for updated_at has to be done by hand
+    now = datetime.utcnow()
+    try:
+        for new_status, ids in by_status.items():
+            await db.execute(
+                update(model).where(model.id.in_(ids)).values(status=new_status, updated_at=now)
+                .execution_options(synchronize_session=False)
+            )
+        with span("db_commit"):
+            await db.commit()
+    except Exception:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Status update failed, no changes were applied")
+
+    if existing:
+        for row in await db.scalars(select(model).where(model.id.in_(existing)).order_by(model.id)):
+            event_bus.publish(event_type, serialize(row))
+
+    return [
+        {"id": row_id, "status": wanted[row_id], "result": "updated" if row_id in existing else "not_found"}
+        for row_id in wanted
+    ]
+
+@app.patch("/orders")
+async def update_orders_status(changes: List[StatusChange], db: AsyncSession = Depends(get_async_db)):
+    return await bulk_update_status(db, Order, changes, "order.updated")
+
+@app.patch("/requests")
+async def update_requests_status(changes: List[StatusChange], db: AsyncSession = Depends(get_async_db)):
+    return await bulk_update_status(db, ServiceRequest, changes, "request.updated")
+
+EVENT_KEEPALIVE_SECONDS = 15
+
+@app.get("/events")
+async def events_endpoint(
+    request: Request,
+    last_event_id: Optional[int] = Header(None),
+):
+    """
+    Server-Sent Events stream of order and service-request changes.
+    Reconnecting clients send Last-Event-ID to replay what they missed; if
+    that is no longer possible a `reset` event tells them to reload in full.
+    """
+    subscription, replay = event_bus.subscribe(last_event_id)
+
+    def format_event(event):
+        return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+
+    async def stream():
+        try:
+            if replay is None:
+                yield "event: reset\ndata: {}\n\n"
+            else:
+                for event in replay:
+                    yield format_event(event)
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), EVENT_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_event(event)
+                if subscription.overflowed:
+                    yield "event: reset\ndata: {}\n\n"
+                    break
+        finally:
+            event_bus.unsubscribe(subscription)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,206 @@
+import difflib
+import re
+import threading
+from collections import namedtuple
+from itertools import chain
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from .models import MenuItem
+from .database import SessionLocal
+
+# --- In-memory Menu Catalog ---
+# The menu is small and read on every order, so it is loaded once per process
+# and looked up from dicts. Committing an ORM insert/update/delete of a MenuItem
+# bumps a version counter; the next lookup sees the new version and reloads.
+# Changes are noted at flush but only count once their transaction commits, so
+# a rolled-back edit never bumps the version (and a reload can't cache a row
+# another transaction hasn't committed yet).
+# Rows changed outside this process (e.g. the seeding scripts) are picked up
+# after restart or an explicit menu_catalog.invalidate().
+
+CatalogItem = namedtuple("CatalogItem", ["id", "name", "description", "price", "category"])
+
+# Fuzzy matches below this similarity ratio are not trusted for an order
+FUZZY_CUTOFF = 0.82
+
+# Section headers for the rendered menu; unknown categories get the default
+CATEGORY_EMOJI = {
+    "breakfast": "🌅",
+    "veg starter": "🥗",
+    "non-veg starter": "🍗",
+    "veg main course": "🍛",
+    "non-veg main course": "🍖",
+    "desserts": "🍰",
+    "breads": "🍞",
+    "drinks": "🥤",
+}
+DEFAULT_CATEGORY_EMOJI = "🍴"
+
+_version_lock = threading.Lock()
+_menu_version = 0
+
+
+def menu_version():
+    """Bumped on every menu change; compare with a saved value to see if the menu moved on."""
+    return _menu_version
+
+
+def bump_menu_version(*_):
+    global _menu_version
+    with _version_lock:
+        _menu_version += 1
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    if any(isinstance(obj, MenuItem) for obj in chain(session.new, session.dirty, session.deleted)):
+        session.info["menu_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_changes(session):
+    if session.info.pop("menu_changed", False):
+        bump_menu_version()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop("menu_changed", None)
+
+
+def normalize(name):
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", " ", name.lower())).strip()
+
+
+def singular(word):
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("es") and word[-3] in "sxz":
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def category_tokens(name):
+    """Singular words of a category, keeping "non-veg" whole so "veg" doesn't match it."""
+    return {singular(word) for word in re.sub(r"[^\w\s-]", " ", name.lower()).split()}
+
+
+def alias_key(name):
+    """Spacing- and plural-insensitive form: "Masala  Dosas" -> "masaladosa"."""
+    return "".join(singular(word) for word in normalize(name).split())
+
+
+class MenuCatalog:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._items = []
+        self._by_name = {}
+        self._by_alias = {}
+        self._by_category = {}
+        self._rendered = {}  # category filter -> rendered text, for the current version
+
+    def invalidate(self):
+        bump_menu_version()
+
+    def _ensure_fresh(self):
+        if self._version == _menu_version:
+            return
+        with self._lock:
+            version = _menu_version
+            if self._version == version:
+                return
+            db = SessionLocal()
+            try:
+                rows = db.query(MenuItem).order_by(MenuItem.id).all()
+                items = [CatalogItem(r.id, r.name, r.description, r.price, r.category) for r in rows]
+            finally:
+                db.close()
+
+            by_name, by_alias, by_category = {}, {}, {}
+            for item in items:
+                # First row wins if the table has duplicate names
+                by_name.setdefault(normalize(item.name), item)
+                by_alias.setdefault(alias_key(item.name), item)
+                by_category.setdefault(item.category or "Other", []).append(item)
+
+            # Swap in complete indexes so readers never see a half-built catalog
+            self._items, self._by_name, self._by_alias, self._by_category = items, by_name, by_alias, by_category
+            self._rendered = {}
+            self._version = version
+
+    def items(self):
+        self._ensure_fresh()
+        return list(self._items)
+
+    def categories(self):
+        """Category name -> items, in menu order."""
+        self._ensure_fresh()
+        return dict(self._by_category)
+
+    def match_categories(self, category):
+        """
+        Category names selected by a free-text filter. "all" or empty selects
+        everything; otherwise a category matches when it contains every word
+        of the filter ("starters" -> both starters, "veg" -> veg sections only).
+        """
+        categories = list(self.categories())
+        if not category or normalize(category) in ("all", "full", "full menu", "menu", "everything"):
+            return categories
+        wanted = category_tokens(category) - {"menu", "item", "dish"}
+        return [name for name in categories if wanted and wanted <= category_tokens(name)]
+
+    def render(self, category="all"):
+        """Menu text grouped by category, cached per filter until the menu changes."""
+        self._ensure_fresh()
+        # Hold this version's cache so a concurrent reload can't receive a stale entry
+        cache = self._rendered
+        cache_key = normalize(category or "all")
+        rendered = cache.get(cache_key)
+        if rendered is None:
+            rendered = self._render(self.match_categories(category), category)
+            cache[cache_key] = rendered
+        return rendered
+
+    def _render(self, selected, category):
+        by_category = self.categories()
+        if not selected:
+            return (f"There is no '{category}' section on the menu. "
+                    f"Available sections: {', '.join(by_category)}.")
+
+        lines = ["🍽️ RESORT MENU 🍽️", "", ""]
+        for name in selected:
+            emoji = CATEGORY_EMOJI.get(name.lower(), DEFAULT_CATEGORY_EMOJI)
+            lines += [f"{emoji} {name.upper()}", "=" * 40, ""]
+            for item in by_category[name]:
+                lines += [f"  • {item.name}", f"    ₹{item.price:g} - {item.description}", ""]
+            lines += ["", ""]
+        return "\n".join(lines)
+
+    def lookup(self, name):
+        """
+        Finds a menu item by name: exact (case-insensitive), then ignoring
+        plurals and spacing, then the closest spelling above FUZZY_CUTOFF.
+        Returns a CatalogItem or None.
+        """
+        self._ensure_fresh()
+        item = self._by_name.get(normalize(name))
+        if item:
+            return item
+        key = alias_key(name)
+        item = self._by_alias.get(key)
+        if item:
+            return item
+        match = difflib.get_close_matches(key, self._by_alias.keys(), n=1, cutoff=FUZZY_CUTOFF)
+        return self._by_alias[match[0]] if match else None
+
+    def suggest(self, name, n=3):
+        """Closest item names, for "did you mean" messages."""
+        self._ensure_fresh()
+        keys = difflib.get_close_matches(alias_key(name), self._by_alias.keys(), n=n, cutoff=0.5)
+        return [self._by_alias[key].name for key in keys]
+
+
+menu_catalog = MenuCatalog()
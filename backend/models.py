@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -21,6 +21,15 @@ class Order(Base):
     total_amount = Column(Float)
     status = Column(String, default="Pending") # Pending, Preparing, Delivered
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow) # Drives ?since= sync
+
+    # Serve the dashboard's filtered, newest-first pages
+    __table_args__ = (
+        Index("ix_orders_status_created_at", "status", "created_at"),
+        Index("ix_orders_room_number_created_at", "room_number", "created_at"),
+        Index("ix_orders_created_at", "created_at"),
+        Index("ix_orders_updated_at_id", "updated_at", "id"),
+    )
 
 class ServiceRequest(Base):
     __tablename__ = "service_requests"
@@ -31,3 +40,66 @@ class ServiceRequest(Base):
     details = Column(String, nullable=True)
     status = Column(String, default="Pending") # Pending, In Progress, Completed
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_service_requests_status_created_at", "status", "created_at"),
+        Index("ix_service_requests_room_number_created_at", "room_number", "created_at"),
+        Index("ix_service_requests_created_at", "created_at"),
+        Index("ix_service_requests_updated_at_id", "updated_at", "id"),
+    )
+
+class Room(Base):
+    __tablename__ = "rooms"
+
+    id = Column(Integer, primary_key=True, index=True)
+    number = Column(String, unique=True) # e.g. "204"
+    room_type = Column(String, index=True) # "Standard", "Deluxe", "Suite"
+    price = Column(Float) # Per night
+    version = Column(Integer, default=0, nullable=False) # Bumped by every claim on the room (reservations.py)
+
+class Booking(Base):
+    __tablename__ = "bookings"
+
+    id = Column(Integer, primary_key=True, index=True)
+    room_id = Column(Integer, ForeignKey("rooms.id"))
+    check_in = Column(Date) # First night
+    check_out = Column(Date) # Departure day; the room is free again that night
+    guest_name = Column(String, nullable=True)
+    status = Column(String, default="Confirmed") # Held, Confirmed, Cancelled
+    reference = Column(String, index=True, nullable=True) # Shared by the rooms of one reservation
+    hold_expires_at = Column(DateTime, nullable=True) # Held bookings stop holding the room after this
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    room = relationship("Room")
+
+    __table_args__ = (
+        Index("ix_bookings_room_id_check_in", "room_id", "check_in"),
+        Index("ix_bookings_check_out", "check_out"), # Loading bookings that haven't ended
+    )
+
+class Conversation(Base):
+    __tablename__ = "conversations"
+
+    id = Column(String, primary_key=True)
+    messages = Column(JSON) # [{"role": "user" | "assistant", "content": "..."}], oldest first
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True) # TTL expiry
+
+class LlmUsage(Base):
+    __tablename__ = "llm_usage"
+
+    id = Column(Integer, primary_key=True, index=True)
+    period = Column(DateTime) # Start of the hour; rolled-up rows: start of the day
+    agent = Column(String) # "Receptionist", "Restaurant", "RoomService" or "Router"
+    tool = Column(String, default="") # Tools whose results the call sent back ("" for none)
+    conversation_id = Column(String, default="") # "" for none, and in rolled-up rows
+    calls = Column(Integer, default=0)
+    prompt_tokens = Column(Integer, default=0)
+    output_tokens = Column(Integer, default=0)
+    latency_ms = Column(Float, default=0) # Summed over the calls
+
+    __table_args__ = (
+        Index("ix_llm_usage_key", "period", "agent", "tool", "conversation_id", unique=True),
+        Index("ix_llm_usage_conversation_id", "conversation_id"),
+    )
@@ -0,0 +1,320 @@
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+# --- Tracing, Metrics and Logs ---
+# Every HTTP request gets a request id (the client's X-Request-ID if it sent one)
+# that is echoed back in the response and attached to every log line written
+# while handling it. Inside a request, span(stage) times one stage of the work:
+#
+#   route           picking the agent (keyword classifier or LLM router)
+#   agent_llm       the agent's first model call of a turn
+#   tool:<name>     one tool call
+#   post_tool_llm   a model call that sends tool results back
+#   db_commit       committing a transaction
+#   chat_queue      waiting for a free chat worker
+#
+# Stage timings feed histograms served at GET /metrics in the Prometheus text
+# format. A sampled share of requests (TRACE_SAMPLE_RATE), plus every slow or
+# failed one, is also logged as one JSON line with its spans, for a per-request
+# latency breakdown. METRICS_ENABLED=0 with TRACE_SAMPLE_RATE=0 and
+# TRACE_SLOW_MS=0 turns spans into almost nothing.
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "2000"))  # 0 disables the slow-request log
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # json | text
+
+# Seconds; model calls dominate, so the buckets reach well past a second
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Spans kept per request; a runaway loop shouldn't grow one log line without bound
+MAX_SPANS = 200
+
+REQUEST_ID_HEADER = "x-request-id"
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+logger = logging.getLogger(__name__)
+
+
+# --- Metrics ---
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            lines.append(f"{self.name}{_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}  # label values -> [per-bucket counts (last is +Inf), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        for label_values, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                le = f'le="{bound:g}"' if bound != "+Inf" else 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, label_values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, label_values)} {total:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.labels, label_values)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+        self.gauges = []  # (name, help, fn returning a number), read at scrape time
+
+    def counter(self, name, help_text, labels=()):
+        metric = Counter(name, help_text, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help_text, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(self, name, help_text, fn):
+        self.gauges.append((name, help_text, fn))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self.metrics:
+            lines += metric.render()
+        for name, help_text, fn in self.gauges:
+            try:
+                value = fn()
+            except Exception:
+                logger.exception("Gauge %s failed", name)
+                continue
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+stage_seconds = metrics.histogram(
+    "resort_stage_duration_seconds", "Time spent in each stage of handling a request.", ("stage",))
+http_request_seconds = metrics.histogram(
+    "resort_http_request_duration_seconds", "HTTP request latency, until the last byte of the response.",
+    ("method", "route"))
+http_requests = metrics.counter(
+    "resort_http_requests_total", "HTTP requests by route and status code.", ("method", "route", "status"))
+
+
+# --- Request Context and Spans ---
+
+class Trace:
+    """What is known about the request being handled: its id and, if recording, its spans."""
+
+    def __init__(self, request_id, sampled):
+        self.request_id = request_id
+        self.sampled = sampled
+        self.recording = sampled or TRACE_SLOW_MS > 0
+        self.started = time.perf_counter()
+        self.spans = []
+        self.finished = False
+
+
+_trace = ContextVar("trace", default=None)
+
+
+def new_request_id():
+    return uuid.uuid4().hex[:16]
+
+
+def current_request_id():
+    trace = _trace.get()
+    return trace.request_id if trace is not None else None
+
+
+@contextmanager
+def span(stage):
+    """Times a stage of the current request for the stage histogram and the request's trace."""
+    trace = _trace.get()
+    recording = trace is not None and trace.recording
+    if not (METRICS_ENABLED or recording):
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if METRICS_ENABLED:
+            stage_seconds.observe(elapsed, stage)
+        # Spans are appended from tool threads too; list.append is atomic
+        if recording and len(trace.spans) < MAX_SPANS:
+            trace.spans.append({
+                "stage": stage,
+                "start_ms": round((start - trace.started) * 1000, 2),
+                "duration_ms": round(elapsed * 1000, 2),
+            })
+
+
+def observe_stage(stage, seconds):
+    """Records a stage that was timed elsewhere (e.g. queue wait measured across threads)."""
+    trace = _trace.get()
+    if METRICS_ENABLED:
+        stage_seconds.observe(seconds, stage)
+    if trace is not None and trace.recording and len(trace.spans) < MAX_SPANS:
+        trace.spans.append({
+            "stage": stage,
+            "start_ms": round((time.perf_counter() - seconds - trace.started) * 1000, 2),
+            "duration_ms": round(seconds * 1000, 2),
+        })
+
+
+class RequestTracingMiddleware:
+    """
+    ASGI middleware: assigns the request id, times the request until its last
+    body chunk is sent (so streamed responses are timed in full) and writes the
+    request's JSON log line when it is sampled, slow or failed.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope.get("headers") or []).get(REQUEST_ID_HEADER.encode(), b"").decode("latin-1")
+        request_id = incoming if REQUEST_ID_PATTERN.match(incoming) else new_request_id()
+        trace = Trace(request_id, sampled=random.random() < TRACE_SAMPLE_RATE)
+        token = _trace.set(trace)
+        status = [500]
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                message["headers"] = list(message.get("headers") or []) + [
+                    (REQUEST_ID_HEADER.encode(), request_id.encode())]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body"):
+                self.finish(scope, trace, status[0])
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            self.finish(scope, trace, status[0])
+            _trace.reset(token)
+
+    def finish(self, scope, trace, status):
+        if trace.finished:
+            return
+        trace.finished = True
+        elapsed = time.perf_counter() - trace.started
+        # The route template, not the raw path, so /orders/1 and /orders/2 share a series
+        route = getattr(scope.get("route"), "path", "unmatched")
+        if METRICS_ENABLED:
+            http_request_seconds.observe(elapsed, scope["method"], route)
+            http_requests.inc(scope["method"], route, str(status))
+
+        slow = TRACE_SLOW_MS > 0 and elapsed * 1000 >= TRACE_SLOW_MS
+        if trace.sampled or slow or status >= 500:
+            logger.info("request", extra={"fields": {
+                "method": scope["method"],
+                "route": route,
+                "path": scope.get("path"),
+                "status": status,
+                "duration_ms": round(elapsed * 1000, 2),
+                "sampled": trace.sampled,
+                "spans": trace.spans,
+            }})
+
+
+# --- Structured Logs ---
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the request id of the request being handled."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = current_request_id()
+        if request_id:
+            entry["request_id"] = request_id
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging():
+    """Sends the backend's log records to stderr, as JSON lines unless LOG_FORMAT=text."""
+    root = logging.getLogger("backend")
+    if root.handlers:
+        return
+    handler = logging.StreamHandler(sys.stderr)
+    if LOG_FORMAT == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+    root.propagate = False
+
+
+configure_logging()
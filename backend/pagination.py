@@ -0,0 +1,190 @@
+import base64
+import os
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from sqlalchemy import and_, func, or_, select
+
+# --- Keyset Pagination ---
+# Lists are ordered newest first by (created_at, id). The cursor is the sort key
+# of the last row returned, so the next page is a range scan on the
+# (status, created_at) / (room_number, created_at) indexes rather than an OFFSET.
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(timestamp, row_id):
+    raw = f"{timestamp.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        timestamp, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def apply_filters(query, model, status=None, room=None, start=None, end=None):
+    if status:
+        query = query.filter(model.status.in_(status))
+    if room:
+        # Prefix match, so the dashboard's room box still finds 101, 102, ... for "1".
+        # A range rather than LIKE, which SQLite can't answer from the room_number indexes
+        upper = room[:-1] + chr(ord(room[-1]) + 1)
+        query = query.filter(model.room_number >= room, model.room_number < upper)
+    if start:
+        query = query.filter(model.created_at >= start)
+    if end:
+        query = query.filter(model.created_at < end)
+    return query
+
+
+def _after_cursor(query, model, cursor):
+    if not cursor:
+        return query
+    created_at, row_id = decode_cursor(cursor)
+    return query.filter(or_(
+        model.created_at < created_at,
+        and_(model.created_at == created_at, model.id < row_id),
+    ))
+
+def _page(rows, limit):
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
+
+
+def paginate(query, model, cursor=None, limit=DEFAULT_PAGE_SIZE, include_total=False):
+    """
+    Returns (rows, next_cursor, total) for a filtered query.
+    next_cursor is None on the last page; total is None unless requested.
+    """
+    total = query.order_by(None).count() if include_total else None
+    query = _after_cursor(query, model, cursor)
+    # Fetch one extra row to learn whether another page exists
+    rows = query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1).all()
+    rows, next_cursor = _page(rows, limit)
+    return rows, next_cursor, total
+
+
+async def paginate_async(db, stmt, model, cursor=None, limit=DEFAULT_PAGE_SIZE, include_total=False):
+    """paginate() for a select() statement on an AsyncSession."""
+    total = None
+    if include_total:
+        total = await db.scalar(select(func.count()).select_from(stmt.order_by(None).subquery()))
+    stmt = _after_cursor(stmt, model, cursor)
+    result = await db.scalars(stmt.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1))
+    rows, next_cursor = _page(result.all(), limit)
+    return rows, next_cursor, total
+
+
+def set_page_headers(response, next_cursor, total):
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if total is not None:
+        response.headers["X-Total-Count"] = str(total)
+
+
+# --- Incremental Sync ---
+# ?since=<cursor> returns rows created or modified after the cursor, oldest change
+# first, keyed on (updated_at, id). since=0 starts from the beginning. Clients
+# upsert the rows by id and send back X-Sync-Cursor; X-Sync-More means another
+# batch is already waiting.
+#
+# updated_at is stamped when a row is flushed, not when its transaction commits,
+# so a slow writer can commit a row whose key is already behind a cursor that
+# was handed out. The first batch of each sync therefore also re-sends the rows
+# changed within SYNC_WINDOW_SECONDS before the cursor, newest first and at most
+# SYNC_WINDOW_MAX_ROWS of them; clients dedupe the repeats by (id, updated_at).
+# Batches fetched because of X-Sync-More skip the window (their cursor says so),
+# so catching up on a burst costs one window, not one per batch.
+#
+# Nothing strictly bounds a write transaction: its rows are stamped before it
+# waits up to SQLITE_BUSY_TIMEOUT_MS for the write lock, and a tool dispatch's
+# writing tools then run one after another with no timeout before the commit.
+# The window covers those waits plus a few inserts; a writer stuck for longer,
+# or a late row behind more than SYNC_WINDOW_MAX_ROWS newer ones, is missed.
+
+SYNC_START = "0"
+SYNC_WINDOW_SECONDS = float(os.getenv("SYNC_WINDOW_SECONDS", "30"))
+SYNC_WINDOW_MAX_ROWS = int(os.getenv("SYNC_WINDOW_MAX_ROWS", "1000"))
+
+
+def _encode_sync_cursor(timestamp, row_id, has_more):
+    # A trailing "|more" marks a cursor handed out with X-Sync-More
+    raw = f"{timestamp.isoformat()}|{row_id}" + ("|more" if has_more else "")
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_sync_cursor(cursor):
+    """(updated_at, id, whether a batch is already waiting)."""
+    try:
+        timestamp, row_id, *more = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(row_id), more == ["more"]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _after_sync_cursor(query, model, since):
+    if since == SYNC_START:
+        return query
+    updated_at, row_id, _ = _decode_sync_cursor(since)
+    return query.filter(or_(
+        model.updated_at > updated_at,
+        and_(model.updated_at == updated_at, model.id > row_id),
+    ))
+
+def _sync_window(query, model, since):
+    """
+    Rows at or before the cursor changed within SYNC_WINDOW_SECONDS of it, newest
+    first, or None if this batch gets no window.
+    """
+    if since == SYNC_START:
+        return None
+    updated_at, row_id, continued = _decode_sync_cursor(since)
+    if continued:
+        return None
+    return query.filter(
+        model.updated_at > updated_at - timedelta(seconds=SYNC_WINDOW_SECONDS),
+        or_(model.updated_at < updated_at, and_(model.updated_at == updated_at, model.id <= row_id)),
+    ).order_by(model.updated_at.desc(), model.id.desc()).limit(SYNC_WINDOW_MAX_ROWS)
+
+def _sync_batch(window_rows, rows, since, limit):
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    # Only rows past the cursor move it on; the window is re-sent until it ages out
+    if rows:
+        new_cursor = _encode_sync_cursor(rows[-1].updated_at, rows[-1].id, has_more)
+    elif since == SYNC_START:
+        new_cursor = since
+    else:
+        new_cursor = _encode_sync_cursor(*_decode_sync_cursor(since)[:2], False)
+    return list(reversed(window_rows)) + rows, new_cursor, has_more
+
+
+def changes_since(query, model, since, limit=DEFAULT_PAGE_SIZE):
+    """Returns (rows, new_cursor, has_more)."""
+    window = _sync_window(query, model, since)
+    window_rows = window.all() if window is not None else []
+    query = _after_sync_cursor(query, model, since).order_by(model.updated_at.asc(), model.id.asc())
+    rows = query.limit(limit + 1).all()
+    return _sync_batch(window_rows, rows, since, limit)
+
+
+async def changes_since_async(db, stmt, model, since, limit=DEFAULT_PAGE_SIZE):
+    """changes_since() for a select() statement on an AsyncSession."""
+    window = _sync_window(stmt, model, since)
+    window_rows = (await db.scalars(window)).all() if window is not None else []
+    stmt = _after_sync_cursor(stmt, model, since).order_by(model.updated_at.asc(), model.id.asc())
+    result = await db.scalars(stmt.limit(limit + 1))
+    return _sync_batch(window_rows, result.all(), since, limit)
+
+
+def set_sync_headers(response, new_cursor, has_more):
+    response.headers["X-Sync-Cursor"] = new_cursor
+    if has_more:
+        response.headers["X-Sync-More"] = "true"
@@ -0,0 +1,248 @@
+import logging
+import os
+import random
+import secrets
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from sqlalchemy import exists, select, update
+from sqlalchemy.exc import OperationalError
+from .availability import RoomInfo, active_booking, availability, note_rooms_changed
+from .database import SessionLocal
+from .models import Booking, Room
+
+# --- Room Reservations ---
+# Booking a stay is two steps: hold_rooms() claims every requested room at once
+# and records them as Held for BOOKING_HOLD_SECONDS, and confirm_reservation()
+# turns the hold into a booking once the guest agrees. A guest who walks away
+# from the chat just lets the hold lapse: an expired hold stops counting as
+# booked, with nothing to clean up.
+#
+# There is no lock around booking. Each room carries a version number, read
+# for every candidate room before the transaction writes anything. Claiming a
+# room is then one conditional UPDATE:
+#
+#   UPDATE rooms SET version = :read + 1
+#    WHERE id = :room AND version = :read
+#      AND NOT EXISTS (an active booking of the room overlapping the stay)
+#
+# Every claim bumps the version, so if another guest claimed the room since it
+# was read, the UPDATE matches no row and this claim fails instead of
+# double-booking (on Postgres too, where the overlap subquery alone could miss
+# a booking committed while the UPDATE waited for the row). A room that was
+# only claimed for other dates is tried again at its new version. All rooms of
+# a reservation are claimed and inserted in one transaction, so a reservation
+# gets every room it asked for or none, and the transaction holds the write
+# lock only for those few statements.
+#
+# Only claims take part in the check: bookings must be added through
+# hold_rooms(), not inserted directly.
+
+BOOKING_HOLD_SECONDS = float(os.getenv("BOOKING_HOLD_SECONDS", "600"))
+BOOKING_MAX_ROOMS = int(os.getenv("BOOKING_MAX_ROOMS", "5"))
+
+# Reads of a room's version before giving it up to a faster guest with other dates
+CLAIM_ATTEMPTS = 3
+# Whole-reservation attempts when the database is busy (SQLite "database is locked")
+BUSY_ATTEMPTS = 3
+
+Reservation = namedtuple("Reservation", ["reference", "rooms", "check_in", "check_out", "total", "expires_at"])
+
+logger = logging.getLogger(__name__)
+
+
+def new_reference():
+    return f"RB-{secrets.token_hex(4).upper()}"
+
+
+def _overlapping(room_id, check_in, check_out, now):
+    return select(Booking.id).where(
+        Booking.room_id == room_id,
+        active_booking(now),
+        Booking.check_in < check_out,
+        Booking.check_out > check_in,
+    )
+
+
+def claim_room(db, room_id, version, check_in, check_out, now):
+    """
+    Claims the room for the stay in db's transaction, if it's free and still at
+    `version`. Returns False if it's taken (or kept being claimed by others).
+    """
+    for _ in range(CLAIM_ATTEMPTS):
+        claimed = db.execute(
+            update(Room)
+            .where(Room.id == room_id, Room.version == version,
+                   ~exists(_overlapping(room_id, check_in, check_out, now)))
+            .values(version=version + 1),
+            execution_options={"synchronize_session": False},
+        )
+        if claimed.rowcount == 1:
+            return True
+        current = db.scalar(select(Room.version).where(Room.id == room_id))
+        if current is None or current == version:
+            return False  # Nobody else claimed it, so a booking overlaps the stay
+        version = current
+    return False
+
+
+def _room_types(rooms):
+    """{room type as stored: count} for a request like {"deluxe rooms": 2}; raises ValueError."""
+    known = availability.room_types()
+    wanted = {}
+    for name, count in rooms.items():
+        room_type = next((known_name for known_name in known if known_name.lower() in str(name).lower()), None)
+        if room_type is None:
+            raise ValueError(f"We don't have {name} rooms. Room types: {', '.join(known)}.")
+        # Gemini passes the counts through a protobuf Struct, so 2 arrives as 2.0
+        if isinstance(count, bool) or not isinstance(count, (int, float)) or count != int(count) or count < 1:
+            raise ValueError(f"Please say how many {room_type} rooms you need.")
+        wanted[room_type] = wanted.get(room_type, 0) + int(count)
+    if not wanted:
+        raise ValueError("Please say which rooms you would like.")
+    if sum(wanted.values()) > BOOKING_MAX_ROOMS:
+        raise ValueError(f"Up to {BOOKING_MAX_ROOMS} rooms can be booked at once; please contact the front desk for groups.")
+    return wanted
+
+
+def hold_rooms(rooms, check_in, check_out, guest_name=None):
+    """
+    Holds rooms for a stay, all or none.
+    Args:
+        rooms: {room type: number of rooms}, e.g. {"Deluxe": 2, "Suite": 1}
+        check_in, check_out: dates, as returned by availability.parse_stay
+    Returns a Reservation; raises ValueError with a message for the guest if the
+    rooms can't all be held.
+    """
+    wanted = _room_types(rooms)
+    for attempt in range(BUSY_ATTEMPTS):
+        try:
+            return _hold(wanted, check_in, check_out, guest_name)
+        except OperationalError:
+            if attempt == BUSY_ATTEMPTS - 1:
+                raise
+            logger.warning("Database busy holding rooms, retrying")
+            time.sleep(random.uniform(0.01, 0.05))
+
+
+def _hold(wanted, check_in, check_out, guest_name):
+    now = datetime.utcnow()
+    db = SessionLocal()
+    lost = set()  # Rooms the bitmaps offered that turned out taken
+    # Candidates are picked before the first claim: once this transaction writes it
+    # holds the database's write lock, and a bitmap reload would need a second connection
+    candidates = {room_type: availability.free_rooms(room_type, check_in, check_out) for room_type in wanted}
+    try:
+        room_ids = [room.id for rooms in candidates.values() for room in rooms]
+        versions = dict(db.execute(select(Room.id, Room.version).where(Room.id.in_(room_ids))).all())
+        held = []
+        for room_type, count in wanted.items():
+            # Guests racing for the same type start at different rooms instead of all on the first
+            random.shuffle(candidates[room_type])
+            claimed = 0
+            for room in candidates[room_type]:
+                if claimed == count:
+                    break
+                if claim_room(db, room.id, versions.get(room.id), check_in, check_out, now):
+                    held.append(room)
+                    claimed += 1
+                else:
+                    lost.add(room.id)
+            if claimed < count:
+                if claimed:
+                    raise ValueError(f"Sorry, only {claimed} {room_type} room{'s are' if claimed != 1 else ' is'} "
+                                     f"free for those dates.")
+                raise ValueError(f"Sorry, no {room_type} rooms are free for those dates.")
+
+        reference = new_reference()
+        expires_at = now + timedelta(seconds=BOOKING_HOLD_SECONDS)
+        for room in held:
+            db.add(Booking(room_id=room.id, check_in=check_in, check_out=check_out, guest_name=guest_name,
+                           status="Held", reference=reference, hold_expires_at=expires_at))
+        db.commit()
+        return _reservation(reference, sorted(held, key=lambda room: room.number), check_in, check_out, expires_at)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+        if lost:
+            availability.mark_rooms_stale(lost)
+
+
+def _reservation(reference, rooms, check_in, check_out, expires_at=None):
+    nights = (check_out - check_in).days
+    return Reservation(reference, rooms, check_in, check_out, sum(room.price for room in rooms) * nights, expires_at)
+
+
+def _load(db, reference, statuses):
+    """The reservation's bookings in these statuses, with their rooms: [(Booking, RoomInfo)]."""
+    rows = (
+        db.query(Booking, Room)
+        .join(Room, Booking.room_id == Room.id)
+        .filter(Booking.reference == reference.strip().upper(), Booking.status.in_(statuses))
+        .order_by(Room.number)
+        .all()
+    )
+    return [(booking, RoomInfo(room.id, room.number, room.room_type, room.price)) for booking, room in rows]
+
+
+def confirm_reservation(reference):
+    """
+    Confirms a held reservation and returns it. Confirming twice is harmless.
+    Raises ValueError if there is no such reservation or its hold has lapsed.
+    """
+    db = SessionLocal()
+    try:
+        held = _load(db, reference, ("Held",))
+        if held:
+            # Bump the rooms' versions first: that takes the write lock and sends any claim
+            # racing for these rooms back to re-check. Only then is the clock read, so a
+            # hold that lapsed while we waited for the lock (and may have been booked over
+            # since) can't be confirmed on a time read before it lapsed
+            db.execute(
+                update(Room)
+                .where(Room.id.in_([room.id for _, room in held]))
+                .values(version=Room.version + 1),
+                execution_options={"synchronize_session": False},
+            )
+            now = datetime.utcnow()
+            # The hold is confirmed only if it hasn't lapsed by now
+            db.execute(
+                update(Booking)
+                .where(Booking.reference == reference.strip().upper(), Booking.status == "Held",
+                       Booking.hold_expires_at > now)
+                .values(status="Confirmed", hold_expires_at=None, updated_at=now),
+                execution_options={"synchronize_session": False},
+            )
+        db.commit()
+        rows = _load(db, reference, ("Held", "Confirmed"))
+        if not rows:
+            raise ValueError(f"There is no booking with reference {reference}.")
+        if any(booking.status != "Confirmed" for booking, _ in rows):
+            raise ValueError(f"The hold on {reference} has expired. Please book the rooms again.")
+        booking = rows[0][0]
+        return _reservation(booking.reference, [room for _, room in rows], booking.check_in, booking.check_out)
+    finally:
+        db.close()
+
+
+def cancel_reservation(reference):
+    """Cancels a held or confirmed reservation and returns it. Raises ValueError if there is nothing to cancel."""
+    db = SessionLocal()
+    try:
+        rows = _load(db, reference, ("Held", "Confirmed"))
+        if not rows:
+            raise ValueError(f"There is no active booking with reference {reference}.")
+        db.execute(
+            update(Booking)
+            .where(Booking.id.in_([booking.id for booking, _ in rows]), Booking.status.in_(("Held", "Confirmed")))
+            .values(status="Cancelled", updated_at=datetime.utcnow()),
+            execution_options={"synchronize_session": False},
+        )
+        note_rooms_changed(db, {room.id for _, room in rows})
+        db.commit()
+        booking = rows[0][0]
+        return _reservation(booking.reference, [room for _, room in rows], booking.check_in, booking.check_out)
+    finally:
+        db.close()
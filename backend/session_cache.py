@@ -0,0 +1,85 @@
+import threading
+import time
+from collections import OrderedDict
+
+# --- Bounded LRU for per-conversation chat sessions ---
+# Entries are evicted when they have been idle longer than idle_ttl, when the
+# cache holds more than max_entries, or when the summed entry sizes exceed
+# max_bytes (least recently used first in both cases).
+
+
+class SessionCache:
+    def __init__(self, max_entries=1000, idle_ttl=1800, max_bytes=50_000_000, size_fn=None):
+        self.max_entries = max_entries
+        self.idle_ttl = idle_ttl
+        self.max_bytes = max_bytes
+        self.size_fn = size_fn or (lambda value: 0)
+        self._entries = OrderedDict()  # key -> (value, size, last_used)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, size, last_used = entry
+            if time.monotonic() - last_used > self.idle_ttl:
+                self._remove(key)
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Stores (or re-stores after it grew) a value and marks it most recently used."""
+        size = self.size_fn(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.monotonic())
+            self._bytes += size
+            self._evict()
+
+    def pop(self, key):
+        with self._lock:
+            if key in self._entries:
+                return self._remove(key)
+            return None
+
+    def _remove(self, key):
+        value, size, _ = self._entries.pop(key)
+        self._bytes -= size
+        return value
+
+    def _evict(self):
+        now = time.monotonic()
+        # Oldest entries sit at the front, so stop at the first live one
+        while self._entries:
+            key, (_, _, last_used) = next(iter(self._entries.items()))
+            if now - last_used <= self.idle_ttl:
+                break
+            self._remove(key)
+            self.evictions += 1
+        while len(self._entries) > self.max_entries or (self._bytes > self.max_bytes and len(self._entries) > 1):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,85 @@
+import os
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import func
+from .events import event_bus
+from .models import Order, ServiceRequest
+from .pagination import apply_filters
+
+# --- Dashboard Aggregates ---
+# Everything the dashboard's KPI cards and charts need, computed with GROUP BY
+# in SQL so the payload stays a few hundred bytes however long the history is.
+# Results are cached per filter combination for STATS_CACHE_SECONDS, and any
+# order/request change published on the event bus makes the cached copies stale.
+
+STATS_CACHE_SECONDS = float(os.getenv("STATS_CACHE_SECONDS", "5"))
+TOP_ROOMS = 10
+
+
+def compute_stats(db, status=None, room=None, start=None, end=None):
+    orders = apply_filters(db.query(Order), Order, status, room, start, end)
+    order_count, revenue = orders.with_entities(
+        func.count(Order.id), func.coalesce(func.sum(Order.total_amount), 0)
+    ).one()
+    orders_by_status = dict(
+        orders.with_entities(Order.status, func.count(Order.id)).group_by(Order.status).all()
+    )
+    revenue_col = func.sum(Order.total_amount).label("revenue")
+    top_rooms = (
+        orders.with_entities(Order.room_number, revenue_col)
+        .group_by(Order.room_number)
+        .order_by(revenue_col.desc())
+        .limit(TOP_ROOMS)
+        .all()
+    )
+
+    requests = apply_filters(db.query(ServiceRequest), ServiceRequest, status, room, start, end)
+    requests_by_type = dict(
+        requests.with_entities(ServiceRequest.request_type, func.count(ServiceRequest.id))
+        .group_by(ServiceRequest.request_type).all()
+    )
+    requests_by_status = dict(
+        requests.with_entities(ServiceRequest.status, func.count(ServiceRequest.id))
+        .group_by(ServiceRequest.status).all()
+    )
+
+    return {
+        "orders": {
+            "count": order_count,
+            "revenue": float(revenue),
+            "pending": orders_by_status.get("Pending", 0),
+            "by_status": orders_by_status,
+            "top_rooms": [{"room_number": r, "revenue": float(v)} for r, v in top_rooms],
+        },
+        "requests": {
+            "count": sum(requests_by_type.values()),
+            "by_type": requests_by_type,
+            "by_status": requests_by_status,
+        },
+        "generated_at": datetime.utcnow().isoformat(),
+    }
+
+
+class StatsCache:
+    def __init__(self, ttl=STATS_CACHE_SECONDS):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}  # filter key -> (expires_at, stats)
+
+    def get(self, db, status=None, room=None, start=None, end=None):
+        key = (tuple(sorted(status or [])), room, start, end, event_bus.stats()["last_event_id"])
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                return entry[1]
+        stats = compute_stats(db, status, room, start, end)
+        with self._lock:
+            # Drop expired entries so one-off filter combinations don't accumulate
+            self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+            self._entries[key] = (now + self.ttl, stats)
+        return stats
+
+
+stats_cache = StatsCache()
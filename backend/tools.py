@@ -1,68 +1,160 @@
 from sqlalchemy.orm import Session
-from .models import MenuItem, Order, ServiceRequest
-from .database import SessionLocal
+from .models import Order, ServiceRequest
+from .menu_catalog import menu_catalog
+from .events import serialize
+from .unit_of_work import unit_of_work
+from .availability import availability, parse_stay
+from .reservations import BOOKING_HOLD_SECONDS, cancel_reservation, confirm_reservation, hold_rooms
 import json
+import re
+import threading
 from datetime import datetime
-from pathlib import Path
-
-# --- Database Helper ---
-def get_db_session():
-    return SessionLocal()
 
 # --- Receptionist Tools ---
-def check_room_availability(room_type: str = None):
+def _stay_text(check_in, check_out):
+    nights = (check_out - check_in).days
+    return f"from {check_in:%a %d %b %Y} to {check_out:%a %d %b %Y} ({nights} night{'s' if nights != 1 else ''})"
+
+def _rooms_text(rooms):
+    return ", ".join(f"{room.room_type} {room.number}" for room in rooms)
+
+def _reference(text):
+    # The model may pass a sentence ("please confirm RB-1A2B3C4D"); pick out the reference
+    match = re.search(r"\bRB-?([0-9A-F]{8})\b", text, re.IGNORECASE)
+    return f"RB-{match.group(1).upper()}" if match else text.strip()
+
+def check_room_availability(room_type: str = None, check_in_date: str = None, check_out_date: str = None):
     """
-    Checks room availability.
+    Checks which rooms are free for a stay.
     Args:
-        room_type: Optional type of room (e.g., "Deluxe", "Suite").
+        room_type: Optional type of room (e.g., "Deluxe", "Suite"). Omit to hear about every type.
+        check_in_date: First night of the stay, as YYYY-MM-DD. Defaults to today.
+        check_out_date: Departure date, as YYYY-MM-DD. Defaults to the day after check-in.
     """
-    # Mock logic with dynamic elements
-    import random
-    
-    room_data = {
-        "deluxe": {"base_price": 200, "count": 5},
-        "suite": {"base_price": 500, "count": 2},
-        "standard": {"base_price": 100, "count": 10}
-    }
-    
-    req_type = room_type.lower() if room_type else "standard"
-    # Mapping simple terms to keys
-    if "suite" in req_type: key = "suite"
-    elif "deluxe" in req_type: key = "deluxe"
-    else: key = "standard"
-    
-    data = room_data[key]
-    
-    # Simulate availability randomly
-    is_available = random.choice([True, True, False]) # Higher chance of availability
-    
-    if is_available:
-        price = data["base_price"] + random.randint(-20, 50) # Dynamic pricing
-        return f"Yes, we have {key.capitalize()} rooms available. The current rate is ${price} per night."
-    else:
-        return f"I'm sorry, but our {key.capitalize()} rooms are currently fully booked. Would you like to check another room type?"
+    try:
+        check_in, check_out = parse_stay(check_in_date, check_out_date)
+    except ValueError as e:
+        return f"Error: {e}"
+    nights = (check_out - check_in).days
+    stay = _stay_text(check_in, check_out)
+
+    room_types = availability.room_types()
+    if not room_types:
+        return "I'm sorry, room bookings are not set up yet. Please contact the front desk."
+
+    # The model may pass a phrase ("a deluxe room for two"); pick out the type named in it
+    wanted = next((name for name in room_types if room_type and name.lower() in room_type.lower()), None)
+    if wanted is None:
+        counts = availability.free_counts(check_in, check_out)
+        lines = [f"- {name}: {counts[name]} of {total} free, from ${price:g} per night"
+                 for name, (total, price) in room_types.items()]
+        return f"Room availability {stay}:\n" + "\n".join(lines)
+
+    rooms = availability.free_rooms(wanted, check_in, check_out)
+    if not rooms:
+        others = [name for name, count in availability.free_counts(check_in, check_out).items() if count]
+        alternative = f" {', '.join(others)} rooms are still available." if others else ""
+        return f"I'm sorry, but our {wanted} rooms are fully booked {stay}.{alternative}"
+    price = min(room.price for room in rooms)
+    return (f"Yes, we have {len(rooms)} {wanted} room{'s' if len(rooms) != 1 else ''} available {stay}. "
+            f"The rate is ${price:g} per night (${price * nights:g} for the stay).")
+
+# Booking tools commit their own short transaction rather than the turn's unit of
+# work: a hold has to be visible to other guests at once, and the claim must not
+# keep the database locked while the model writes its reply.
+def book_rooms(rooms: dict, check_in_date: str = None, check_out_date: str = None, guest_name: str = ""):
+    """
+    Books rooms for a stay, holding them while the guest confirms. Either every room is held or none.
+    Args:
+        rooms: Room types and how many of each, e.g. {"Deluxe": 2, "Suite": 1}.
+        check_in_date: First night of the stay, as YYYY-MM-DD.
+        check_out_date: Departure date, as YYYY-MM-DD.
+        guest_name: Name the booking is under.
+    """
+    try:
+        check_in, check_out = parse_stay(check_in_date, check_out_date)
+        reservation = hold_rooms(rooms, check_in, check_out, guest_name or None)
+    except ValueError as e:
+        return f"Error: {e}"
+    except Exception as e:
+        return f"Error: Failed to book rooms: {str(e)}"
+    return (f"Held {_rooms_text(reservation.rooms)} {_stay_text(check_in, check_out)}. "
+            f"Total: ${reservation.total:g}. Booking reference: {reservation.reference}. "
+            f"The rooms are held for {BOOKING_HOLD_SECONDS / 60:g} minutes; "
+            f"please ask the guest to confirm, then call confirm_booking.")
+
+def confirm_booking(booking_reference: str):
+    """
+    Confirms rooms held by book_rooms, once the guest agrees.
+    Args:
+        booking_reference: The reference book_rooms returned, e.g. "RB-1A2B3C4D".
+    """
+    try:
+        reservation = confirm_reservation(_reference(booking_reference))
+    except ValueError as e:
+        return f"Error: {e}"
+    except Exception as e:
+        return f"Error: Failed to confirm booking: {str(e)}"
+    return (f"Booking {reservation.reference} is confirmed: {_rooms_text(reservation.rooms)} "
+            f"{_stay_text(reservation.check_in, reservation.check_out)}. Total: ${reservation.total:g}.")
+
+def cancel_booking(booking_reference: str):
+    """
+    Cancels a booking or a hold.
+    Args:
+        booking_reference: The booking reference, e.g. "RB-1A2B3C4D".
+    """
+    try:
+        reservation = cancel_reservation(_reference(booking_reference))
+    except ValueError as e:
+        return f"Error: {e}"
+    except Exception as e:
+        return f"Error: Failed to cancel booking: {str(e)}"
+    return f"Booking {reservation.reference} ({_rooms_text(reservation.rooms)}) has been cancelled."
+
+# Facility answers. Change them through update_facility, so answers cached from
+# them (see faq_cache.py) are dropped.
+FACILITIES = {
+    "gym": "The Gym is open from 6 AM to 10 PM. It is located on the 2nd floor.",
+    "spa": "The Spa offers massages and treatments from 10 AM to 8 PM. Booking is required at extension 101.",
+    "pool": "The Swimming Pool is open from 7 AM to 9 PM. Please wear appropriate swimwear.",
+    "restaurant": "The Restaurant serves breakfast (7-10 AM), lunch (12-3 PM), and dinner (7-11 PM).",
+    "checkin": "Check-in time is 2:00 PM.",
+    "checkout": "Check-out time is 11:00 AM.",
+    "wifi": "Free high-speed Wi-Fi is available throughout the resort. Network: 'ResortGuest', Password: 'relaxandenjoy'.",
+    "parking": "Valet parking is complimentary for all guests."
+}
+_facility_version = 0
+_facility_lock = threading.Lock()
+
+def facility_version():
+    return _facility_version
+
+def update_facility(name, info):
+    """Sets the answer for a facility and bumps the version that cached answers are checked against."""
+    global _facility_version
+    with _facility_lock:
+        FACILITIES[name.lower()] = info
+        _facility_version += 1
 
 def get_facility_info(facility_name: str):
     """
-    Returns information about resort facilities.
-    """
-    facilities = {
-        "gym": "The Gym is open from 6 AM to 10 PM. It is located on the 2nd floor.",
-        "spa": "The Spa offers massages and treatments from 10 AM to 8 PM. Booking is required at extension 101.",
-        "pool": "The Swimming Pool is open from 7 AM to 9 PM. Please wear appropriate swimwear.",
-        "restaurant": "The Restaurant serves breakfast (7-10 AM), lunch (12-3 PM), and dinner (7-11 PM).",
-        "checkin": "Check-in time is 2:00 PM.",
-        "checkout": "Check-out time is 11:00 AM.",
-        "wifi": "Free high-speed Wi-Fi is available throughout the resort. Network: 'ResortGuest', Password: 'relaxandenjoy'.",
-        "parking": "Valet parking is complimentary for all guests."
-    }
+    Returns information about resort facilities: opening hours of the gym, spa,
+    pool and restaurant, check-in and check-out time, the Wi-Fi password and parking.
+    Args:
+        facility_name: "gym", "spa", "pool", "restaurant", "check-in", "check-out", "wifi" or "parking".
+    """
+    facilities = FACILITIES
     
     # Simple fuzzy matching or direct lookup
     key = facility_name.lower()
-    if "check" in key and "in" in key: return facilities["checkin"]
     if "check" in key and "out" in key: return facilities["checkout"]
-    if "wifi" in key: return facilities["wifi"]
+    if "check" in key and "in" in key: return facilities["checkin"]
+    if "wifi" in key or "wi-fi" in key: return facilities["wifi"]
     if "park" in key: return facilities["parking"]
+    for name, info in facilities.items():
+        if name in key: # e.g. "swimming pool", "is the gym open?"
+            return info
     
     return facilities.get(key, "I can answer questions about the Gym, Spa, Pool, Restaurant, Check-in/out times, Wi-Fi, and Parking.")
 
@@ -70,22 +162,33 @@ def get_facility_info(facility_name: str):
 
 def get_menu_items(category: str = "all"):
     """
-    Retrieves the menu from the text file.
+    Retrieves the restaurant menu, grouped by section.
     Args:
-        category: Optional category filter.
+        category: Menu section to show, e.g. "Breakfast", "Veg Starter", "Non-Veg Main Course",
+            "Desserts", "Breads", "Drinks", "Miscellaneous". Use "all" for the full menu.
     """
     try:
-        # Get the project root directory (parent of backend/)
-        current_dir = Path(__file__).parent
-        project_root = current_dir.parent
-        menu_file = project_root / "menu_output.txt"
-        
-        with open(menu_file, "r", encoding="utf-8") as f:
-            return f.read()
-    except FileNotFoundError as e:
-        return f"Error: Menu file not found at {menu_file}. Please ensure menu_output.txt exists in the project root."
+        return menu_catalog.render(category)
     except Exception as e:
-        return f"Error reading menu file: {str(e)}"
+        return f"Error reading menu: {str(e)}"
+
+def price_order(items_dict: dict):
+    """
+    Validates an order against the in-memory catalog.
+    Returns (valid_items, total_cost, error); error is a guest-facing message or None.
+    """
+    total_cost = 0
+    valid_items = []
+    for item_name, quantity in items_dict.items():
+        menu_item = menu_catalog.lookup(item_name)
+        if menu_item:
+            total_cost += menu_item.price * quantity
+            valid_items.append({"name": menu_item.name, "quantity": quantity, "price": menu_item.price})
+        else:
+            suggestions = menu_catalog.suggest(item_name)
+            hint = f" Did you mean: {', '.join(suggestions)}?" if suggestions else ""
+            return None, 0, f"Error: Item '{item_name}' is not on the menu.{hint}"
+    return valid_items, total_cost, None
 
 def place_restaurant_order(room_number: str, items_dict: dict):
     """
@@ -94,53 +197,41 @@ def place_restaurant_order(room_number: str, items_dict: dict):
         room_number: The guest's room number.
         items_dict: A dictionary of item names and quantities. e.g., {"Masala Dosa": 2, "Coffee": 1}
     """
-    db = get_db_session()
+    valid_items, total_cost, error = price_order(items_dict)
+    if error:
+        return error
+
     try:
-        total_cost = 0
-        valid_items = []
-        
-        # Validate items and calculate cost
-        for item_name, quantity in items_dict.items():
-            menu_item = db.query(MenuItem).filter(MenuItem.name.ilike(item_name)).first()
-            if menu_item:
-                total_cost += menu_item.price * quantity
-                valid_items.append({"name": menu_item.name, "quantity": quantity, "price": menu_item.price})
-            else:
-                return f"Error: Item '{item_name}' is not on the menu."
-
-        new_order = Order(
-            room_number=room_number,
-            items=valid_items,
-            total_amount=total_cost,
-            status="Pending"
-        )
-        db.add(new_order)
-        db.commit()
-        db.refresh(new_order)
+        with unit_of_work() as uow:
+            new_order = Order(
+                room_number=room_number,
+                items=valid_items,
+                total_amount=total_cost,
+                status="Pending"
+            )
+            uow.session.add(new_order)
+            uow.session.flush()  # Assigns the id; the turn commits
+            uow.publish("order.created", serialize(new_order))
         return f"Order placed successfully! Order ID: {new_order.id}. Total Bill: ₹{total_cost}."
     except Exception as e:
         return f"Failed to place order: {str(e)}"
-    finally:
-        db.close()
 
 # --- Room Service Tools ---
 def create_room_service_request(room_number: str, request_type: str, details: str = ""):
     """
     Creates a service request (cleaning, laundry, amenities).
     """
-    db = get_db_session()
     try:
-        new_request = ServiceRequest(
-            room_number=room_number,
-            request_type=request_type,
-            details=details,
-            status="Pending"
-        )
-        db.add(new_request)
-        db.commit()
-        db.refresh(new_request)
+        with unit_of_work() as uow:
+            new_request = ServiceRequest(
+                room_number=room_number,
+                request_type=request_type,
+                details=details,
+                status="Pending"
+            )
+            uow.session.add(new_request)
+            uow.session.flush()
+            uow.publish("request.created", serialize(new_request))
         return f"Service request created. Request ID: {new_request.id}. We will attend to it shortly."
     except Exception as e:
         return f"Failed to create request: {str(e)}"
-    finally:
-        db.close()
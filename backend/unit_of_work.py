@@ -0,0 +1,99 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from .database import SessionLocal
+from .events import event_bus
+from .observability import span
+
+# --- Unit of Work ---
+# Each tool dispatch in a chat turn (see ResortAgent.dispatch_tools) opens one
+# unit of work; every writing tool it runs goes through the same session and
+# transaction, which is committed once after the last of them. Each tool writes
+# inside its own savepoint, so a tool that fails rolls back only its own writes
+# and the tools before it still commit, as they reported. Events are published
+# only after the commit, so dashboards never see a row that was rolled back.
+#
+# Tools called outside a turn (scripts, benchmarks) get a unit of work of their own.
+
+_current = ContextVar("unit_of_work", default=None)
+
+
+class UnitOfWork:
+    def __init__(self):
+        self._session = None
+        self._events = []
+
+    @property
+    def session(self):
+        # Opened on first use, so turns that never touch the database never take a connection.
+        # Rows stay readable after commit, so nothing has to be reloaded to report on them.
+        if self._session is None:
+            self._session = SessionLocal(expire_on_commit=False)
+        return self._session
+
+    @contextmanager
+    def savepoint(self):
+        """Rolls back what was written inside the block, and its events, if the block fails."""
+        session = self.session
+        if session.get_bind().dialect.name == "sqlite":
+            # pysqlite only opens a transaction before DML, and a SAVEPOINT outside one
+            # would commit on release instead of nesting in the unit's transaction
+            dbapi_connection = session.connection().connection.dbapi_connection
+            if not dbapi_connection.in_transaction:
+                dbapi_connection.execute("BEGIN")
+        queued = len(self._events)
+        savepoint = session.begin_nested()
+        try:
+            yield
+        except BaseException:
+            savepoint.rollback()
+            del self._events[queued:]
+            raise
+        savepoint.commit()
+
+    def publish(self, event_type, data):
+        """Queues an event until the transaction commits."""
+        self._events.append((event_type, data))
+
+    def commit(self):
+        if self._session is not None:
+            with span("db_commit"):
+                self._session.commit()
+        events, self._events = self._events, []
+        for event_type, data in events:
+            event_bus.publish(event_type, data)
+
+    def rollback(self):
+        if self._session is not None:
+            self._session.rollback()
+        self._events = []
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+
+@contextmanager
+def unit_of_work():
+    """
+    Joins the unit of work already active in this context, inside a savepoint
+    that a failure rolls back, or starts one that commits on exit and rolls back
+    entirely on failure.
+    """
+    uow = _current.get()
+    if uow is not None:
+        with uow.savepoint():
+            yield uow
+        return
+
+    uow = UnitOfWork()
+    token = _current.set(uow)
+    try:
+        yield uow
+        uow.commit()
+    except BaseException:
+        uow.rollback()
+        raise
+    finally:
+        _current.reset(token)
+        uow.close()
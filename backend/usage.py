@@ -0,0 +1,233 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from .database import SessionLocal
+from .models import LlmUsage
+
+# --- LLM Usage Accounting ---
+# Every model call (router, agent, and the calls that send tool results back)
+# reports its prompt tokens, output tokens and latency here. Calls are summed in
+# memory per (hour, agent, tool, conversation) and written to the `llm_usage`
+# table every USAGE_FLUSH_SECONDS, so a busy hour costs a handful of rows rather
+# than one per call. Rows older than USAGE_DETAIL_DAYS are rolled up into one
+# row per day, agent and tool (the conversation is dropped). GET /usage reports
+# totals and an estimated cost from the LLM_PRICE_* settings.
+#
+# A call's `tool` is the tools whose results it sent back to the model, so the
+# token cost of e.g. the menu text shows up under get_menu_items.
+
+USAGE_FLUSH_SECONDS = float(os.getenv("USAGE_FLUSH_SECONDS", "10"))
+USAGE_DETAIL_DAYS = int(os.getenv("USAGE_DETAIL_DAYS", "7"))
+# USD per million tokens; the defaults are Gemini 2.0 Flash list prices
+LLM_PRICE_INPUT_PER_MTOK = float(os.getenv("LLM_PRICE_INPUT_PER_MTOK", "0.10"))
+LLM_PRICE_OUTPUT_PER_MTOK = float(os.getenv("LLM_PRICE_OUTPUT_PER_MTOK", "0.40"))
+
+# How often old rows are checked for rolling up
+ROLLUP_EVERY_SECONDS = 3600
+
+GROUP_COLUMNS = {
+    "agent": ("agent",),
+    "tool": ("tool",),
+    "conversation": ("conversation_id",),
+    "agent_tool": ("agent", "tool"),
+}
+
+logger = logging.getLogger(__name__)
+
+
+def _hour(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _day(moment):
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def tools_label(message):
+    """The `tool` a model call is charged to: the tools whose results it sends, if any."""
+    if isinstance(message, str):
+        return ""
+    return "+".join(sorted({result.name for result in message}))
+
+
+def estimated_cost(prompt_tokens, output_tokens):
+    return (prompt_tokens * LLM_PRICE_INPUT_PER_MTOK + output_tokens * LLM_PRICE_OUTPUT_PER_MTOK) / 1_000_000
+
+
+def _add_rows(db, totals):
+    """Adds {(period, agent, tool, conversation_id): [calls, prompt, output, latency_ms]} to the table."""
+    keys = list(totals)
+    existing = {
+        (row.period, row.agent, row.tool, row.conversation_id): row
+        for row in db.query(LlmUsage).filter(
+            LlmUsage.period.in_({key[0] for key in keys}),
+            LlmUsage.conversation_id.in_({key[3] for key in keys}),
+        )
+    }
+    for key, (calls, prompt_tokens, output_tokens, latency_ms) in totals.items():
+        row = existing.get(key)
+        if row is None:
+            period, agent, tool, conversation_id = key
+            row = LlmUsage(period=period, agent=agent, tool=tool, conversation_id=conversation_id,
+                           calls=0, prompt_tokens=0, output_tokens=0, latency_ms=0)
+            db.add(row)
+            existing[key] = row
+        row.calls += calls
+        row.prompt_tokens += prompt_tokens
+        row.output_tokens += output_tokens
+        row.latency_ms += latency_ms
+
+
+def _merge(into, totals):
+    for key, values in totals.items():
+        entry = into.setdefault(key, [0, 0, 0, 0.0])
+        for i, value in enumerate(values):
+            entry[i] += value
+
+
+class UsageMeter:
+    def __init__(self, flush_seconds=USAGE_FLUSH_SECONDS, detail_days=USAGE_DETAIL_DAYS):
+        self.flush_seconds = flush_seconds
+        self.detail_days = detail_days
+        self._pending = {}  # (hour, agent, tool, conversation_id) -> [calls, prompt, output, latency_ms]
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flusher = None
+        self._last_rollup = 0.0
+
+    def record(self, agent, tool, conversation_id, usage, latency):
+        """
+        Counts one model call.
+        Args:
+            usage: the response's llm.Usage, or None if the API didn't report it (tokens count as 0)
+            latency: seconds the call took
+        """
+        key = (_hour(datetime.utcnow()), agent, tool or "", conversation_id or "")
+        prompt_tokens = usage.prompt_tokens if usage else 0
+        output_tokens = usage.output_tokens if usage else 0
+        with self._lock:
+            _merge(self._pending, {key: (1, prompt_tokens, output_tokens, latency * 1000)})
+            if self._flusher is None and self.flush_seconds > 0:
+                self._flusher = threading.Thread(target=self._flush_periodically, name="usage-flush", daemon=True)
+                self._flusher.start()
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Writing LLM usage failed")
+
+    def flush(self):
+        """Writes the calls counted since the last flush, and rolls up old rows when due."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if pending:
+                db = SessionLocal()
+                try:
+                    _add_rows(db, pending)
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    with self._lock:
+                        _merge(self._pending, pending)  # Try again next time
+                    raise
+                finally:
+                    db.close()
+            if time.monotonic() - self._last_rollup >= ROLLUP_EVERY_SECONDS:
+                self.rollup()
+                self._last_rollup = time.monotonic()
+
+    def rollup(self, now=None):
+        """Folds rows older than detail_days into one row per day, agent and tool. Returns rows removed."""
+        cutoff = _day(now or datetime.utcnow()) - timedelta(days=self.detail_days)
+        db = SessionLocal()
+        try:
+            totals = {}
+            removed = 0
+            for row in db.query(LlmUsage).filter(LlmUsage.period < cutoff):
+                if row.conversation_id == "" and row.period == _day(row.period):
+                    continue  # Already a daily row
+                _merge(totals, {(_day(row.period), row.agent, row.tool, ""):
+                                (row.calls, row.prompt_tokens, row.output_tokens, row.latency_ms)})
+                db.delete(row)
+                removed += 1
+            if removed:
+                db.flush()
+                _add_rows(db, totals)
+                db.commit()
+            return removed
+        finally:
+            db.close()
+
+
+def usage_report(db, group_by="agent", conversation_id=None, start=None, end=None, limit=100):
+    """
+    Token totals, average latency and estimated cost, grouped by agent, tool,
+    conversation or agent and tool, largest first. Rolled-up rows count under
+    conversation "".
+    """
+    columns = [getattr(LlmUsage, name) for name in GROUP_COLUMNS[group_by]]
+    query = db.query(LlmUsage)
+    if conversation_id is not None:
+        query = query.filter(LlmUsage.conversation_id == conversation_id)
+    if start:
+        query = query.filter(LlmUsage.period >= _hour(start))
+    if end:
+        query = query.filter(LlmUsage.period <= end)
+
+    tokens = func.sum(LlmUsage.prompt_tokens + LlmUsage.output_tokens)
+    rows = (
+        query.with_entities(
+            *columns,
+            func.sum(LlmUsage.calls), func.sum(LlmUsage.prompt_tokens),
+            func.sum(LlmUsage.output_tokens), func.sum(LlmUsage.latency_ms),
+        )
+        .group_by(*columns)
+        .order_by(tokens.desc())
+        .limit(limit)
+        .all()
+    )
+    calls, prompt_tokens, output_tokens, latency_ms = query.with_entities(
+        func.coalesce(func.sum(LlmUsage.calls), 0), func.coalesce(func.sum(LlmUsage.prompt_tokens), 0),
+        func.coalesce(func.sum(LlmUsage.output_tokens), 0), func.coalesce(func.sum(LlmUsage.latency_ms), 0),
+    ).one()
+
+    def summary(calls, prompt_tokens, output_tokens, latency_ms):
+        return {
+            "calls": calls,
+            "prompt_tokens": prompt_tokens,
+            "output_tokens": output_tokens,
+            "avg_prompt_tokens": round(prompt_tokens / calls, 1) if calls else 0,
+            "avg_latency_ms": round(latency_ms / calls, 1) if calls else 0,
+            "cost_usd": round(estimated_cost(prompt_tokens, output_tokens), 6),
+        }
+
+    width = len(columns)
+    return {
+        "group_by": group_by,
+        "groups": [
+            {**dict(zip(GROUP_COLUMNS[group_by], row[:width])), **summary(*row[width:])}
+            for row in rows
+        ],
+        "total": summary(calls, prompt_tokens, output_tokens, latency_ms),
+        "prices_per_mtok": {"input": LLM_PRICE_INPUT_PER_MTOK, "output": LLM_PRICE_OUTPUT_PER_MTOK},
+    }
+
+
+usage_meter = UsageMeter()
+
+
+@atexit.register
+def _flush_at_exit():
+    # Calls counted since the last flush would otherwise be lost on a clean shutdown
+    try:
+        usage_meter.flush()
+    except Exception:
+        logger.exception("Writing LLM usage at exit failed")
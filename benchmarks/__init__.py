@@ -0,0 +1,10 @@
+"""
+End-to-end load and latency benchmarks.
+
+Runs the FastAPI app in-process against a throwaway SQLite database and the
+offline LLM stub, drives it with concurrent virtual guests and dashboard
+pollers, and writes per-endpoint and per-stage latency percentiles to JSON.
+
+    python -m benchmarks.run --guests 20 --duration 30
+    python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json
+"""
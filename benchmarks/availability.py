@@ -0,0 +1,137 @@
+"""
+Room availability queries: the in-memory occupancy bitmaps vs. a SQL overlap query.
+
+Seeds a fresh SQLite file with a hotel of --rooms rooms and about a year of
+bookings (back-to-back stays with short gaps), then times "which rooms of
+type X are free from A to B" for random types and stays both ways, checking
+that they agree.
+
+    python -m benchmarks.availability --rooms 400 --queries 2000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from .run import RESULTS_DIR, git_commit
+from .stats import LatencyRecorder
+
+ROOM_TYPES = [("Standard", 100, 0.65), ("Deluxe", 200, 0.25), ("Suite", 500, 0.10)]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Latency of room availability queries.")
+    parser.add_argument("--rooms", type=int, default=400, help="rooms in the hotel")
+    parser.add_argument("--days", type=int, default=365, help="days ahead covered by bookings")
+    parser.add_argument("--queries", type=int, default=2000, help="availability queries per method")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, help="result JSON path (default: benchmarks/results/availability_<time>_<commit>.json)")
+    return parser.parse_args()
+
+
+def seed(args, rng):
+    from sqlalchemy import insert
+    from backend.database import SessionLocal
+    from backend.models import Booking, Room
+
+    db = SessionLocal()
+    for i in range(args.rooms):
+        room_type, price = rng.choices([(t, p) for t, p, _ in ROOM_TYPES], [w for _, _, w in ROOM_TYPES])[0]
+        db.add(Room(number=str(1000 + i), room_type=room_type, price=price))
+    db.commit()
+
+    today = date.today()
+    bookings = []
+    for room_id in range(1, args.rooms + 1):
+        day = rng.randint(0, 3)
+        while day < args.days:
+            nights = rng.randint(1, 7)
+            bookings.append({"room_id": room_id, "check_in": today + timedelta(days=day),
+                             "check_out": today + timedelta(days=day + nights), "status": "Confirmed"})
+            day += nights + rng.choice([0, 0, 1, 2, 4])
+    db.execute(insert(Booking), bookings)
+    db.commit()
+    db.close()
+    return len(bookings)
+
+
+def sql_free_rooms(db, room_type, check_in, check_out):
+    from sqlalchemy import select
+    from backend.availability import active_booking
+    from backend.models import Booking, Room
+    overlapping = select(Booking.room_id).where(
+        active_booking(), Booking.check_in < check_out, Booking.check_out > check_in)
+    return db.query(Room).filter(Room.room_type == room_type, Room.id.not_in(overlapping)).all()
+
+
+def main():
+    args = parse_args()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='resort-avail-'), 'bench.db')}"
+    from backend.database import SessionLocal, init_db
+    from backend.availability import availability
+
+    init_db()
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    booking_count = seed(args, rng)
+    print(f"Seeded {args.rooms} rooms and {booking_count} bookings in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    availability.room_types()  # First query loads the bitmaps
+    load_ms = (time.perf_counter() - started) * 1000
+    print(f"Bitmaps loaded in {load_ms:.1f} ms")
+
+    today = date.today()
+    stays = []
+    for _ in range(args.queries):
+        start = today + timedelta(days=rng.randint(0, args.days - 30))
+        stays.append((rng.choice(ROOM_TYPES)[0], start, start + timedelta(days=rng.randint(1, 14))))
+
+    recorder = LatencyRecorder()
+    mismatches = 0
+    started = time.perf_counter()
+    db = SessionLocal()
+    for room_type, check_in, check_out in stays:
+        t0 = time.perf_counter()
+        engine_rooms = availability.free_rooms(room_type, check_in, check_out)
+        t1 = time.perf_counter()
+        sql_rooms = sql_free_rooms(db, room_type, check_in, check_out)
+        t2 = time.perf_counter()
+        recorder.record("bitmap", (t1 - t0) * 1000)
+        recorder.record("sql", (t2 - t1) * 1000)
+        if {room.id for room in engine_rooms} != {room.id for room in sql_rooms}:
+            mismatches += 1
+    db.close()
+
+    report = recorder.report(time.perf_counter() - started)
+    print(f"\n{'method':<10}{'queries':>9}{'queries/s':>11}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for method, row in report.items():
+        # One method's rate on its own, not the interleaved loop's
+        row["queries_per_s"] = 1000 / row["mean_ms"] if row["mean_ms"] else 0.0
+        print(f"{method:<10}{row['count']:>9}{row['queries_per_s']:>11.0f}"
+              f"{row['p50_ms']:>10.3f}{row['p95_ms']:>10.3f}{row['p99_ms']:>10.3f}")
+    print(f"\nResults that differ between the two: {mismatches}")
+
+    commit = git_commit()
+    output = args.output or RESULTS_DIR / f"availability_{datetime.now():%Y%m%d_%H%M%S}_{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()},
+        "bookings": booking_count,
+        "bitmap_load_ms": load_ms,
+        "mismatches": mismatches,
+        "queries": report,
+    }, indent=2))
+    print(f"Results written to {output}")
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import argparse
+import json
+import sys
+
+METRICS = ("p50_ms", "p95_ms", "p99_ms")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="percent slowdown in p95 that counts as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    return parser.parse_args()
+
+
+def change(old, new):
+    if not old:
+        return 0.0
+    return (new - old) / old * 100
+
+
+def main():
+    args = parse_args()
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    print(f"baseline {baseline['commit']} ({baseline['timestamp']})  ->  "
+          f"candidate {candidate['commit']} ({candidate['timestamp']})\n")
+    print(f"{'name':<40}" + "".join(f"{m:>22}" for m in METRICS))
+
+    regressions = []
+    for section in ("endpoints", "stages"):
+        for name in sorted(set(baseline[section]) | set(candidate[section])):
+            old = baseline[section].get(name)
+            new = candidate[section].get(name)
+            if old is None or new is None:
+                print(f"{name:<40}{'only in ' + ('candidate' if old is None else 'baseline'):>22}")
+                continue
+            cells = "".join(
+                f"{old[m]:>8.1f} ->{new[m]:>7.1f} {change(old[m], new[m]):>+4.0f}%" for m in METRICS
+            )
+            print(f"{name:<40}{cells}")
+            if change(old["p95_ms"], new["p95_ms"]) > args.threshold:
+                regressions.append(name)
+
+    old_tp, new_tp = baseline["total_throughput_per_s"], candidate["total_throughput_per_s"]
+    print(f"\nThroughput: {old_tp:.1f} -> {new_tp:.1f} req/s ({change(old_tp, new_tp):+.0f}%)")
+    if regressions:
+        print(f"p95 regressions over {args.threshold:.0f}%: {', '.join(regressions)}")
+        if args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
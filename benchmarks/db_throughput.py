@@ -0,0 +1,165 @@
+"""
+Database throughput under concurrent load: untuned engine vs. the tuned one.
+
+Writer threads insert orders and update their status, like chat turns and
+dashboard saves; reader threads list the newest page of orders and compute
+the dashboard aggregates. Each configuration gets its own fresh SQLite file.
+
+    python -m benchmarks.db_throughput --writers 8 --readers 8 --duration 10
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy.orm import sessionmaker
+
+from .run import RESULTS_DIR, git_commit
+from .stats import LatencyRecorder
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Concurrent read/write throughput of the database engine settings.")
+    parser.add_argument("--writers", type=int, default=8, help="threads inserting and updating orders")
+    parser.add_argument("--readers", type=int, default=8, help="threads listing orders and computing stats")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run each configuration")
+    parser.add_argument("--seed-orders", type=int, default=5000, help="orders inserted before each run")
+    parser.add_argument("--output", type=Path, help="result JSON path (default: benchmarks/results/db_<time>_<commit>.json)")
+    return parser.parse_args()
+
+
+def configurations():
+    from backend import database
+    return {
+        # What database.py did before: SQLAlchemy's default pool, SQLite's default pragmas
+        "default": {"pragmas": False, "pool_size": None},
+        "tuned": {"pragmas": True, "pool_size": database.DB_POOL_SIZE, "max_overflow": database.DB_MAX_OVERFLOW},
+    }
+
+
+def seed(Session, count):
+    from backend.models import Order
+    db = Session()
+    for i in range(count):
+        db.add(Order(room_number=str(100 + i % 350), items=[{"name": "Masala Dosa", "quantity": 1, "price": 120}],
+                     total_amount=120, status="Delivered"))
+    db.commit()
+    db.close()
+
+
+def writer(Session, recorder, stop, rng):
+    from backend.models import Order
+    while not stop.is_set():
+        start = time.perf_counter()
+        db = Session()
+        try:
+            order = Order(room_number=str(rng.randint(100, 450)), total_amount=240, status="Pending",
+                          items=[{"name": "Masala Dosa", "quantity": 2, "price": 120}])
+            db.add(order)
+            db.commit()
+            recorder.record("write:insert_order", (time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            order.status = "Preparing"
+            db.commit()
+            recorder.record("write:update_status", (time.perf_counter() - start) * 1000)
+        except Exception:
+            db.rollback()
+            recorder.record_error("write:insert_order")
+        finally:
+            db.close()
+
+
+def reader(Session, recorder, stop):
+    from backend.models import Order
+    from backend.pagination import paginate
+    from backend.stats import compute_stats
+    while not stop.is_set():
+        db = Session()
+        try:
+            start = time.perf_counter()
+            paginate(db.query(Order), Order, limit=100)
+            recorder.record("read:list_orders", (time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            compute_stats(db)
+            recorder.record("read:stats", (time.perf_counter() - start) * 1000)
+        except Exception:
+            recorder.record_error("read:list_orders")
+        finally:
+            db.close()
+
+
+def run_configuration(name, options, args):
+    from backend.database import Base, make_engine
+    from backend import models  # noqa: F401  (registers the tables on Base)
+
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='resort-dbbench-'), 'bench.db')}"
+    engine = make_engine(url, **options)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    seed(Session, args.seed_orders)
+
+    recorder = LatencyRecorder()
+    stop = threading.Event()
+    threads = [threading.Thread(target=writer, args=(Session, recorder, stop, random.Random(i)))
+               for i in range(args.writers)]
+    threads += [threading.Thread(target=reader, args=(Session, recorder, stop)) for _ in range(args.readers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - started
+    engine.dispose()
+
+    report = recorder.report(duration)
+    return {
+        "options": options,
+        "duration_s": duration,
+        "write_throughput_per_s": sum(row["count"] for key, row in report.items() if key.startswith("write:")) / duration,
+        "read_throughput_per_s": sum(row["count"] for key, row in report.items() if key.startswith("read:")) / duration,
+        "operations": report,
+    }
+
+
+def print_report(results):
+    print(f"\n{'config':<10}{'operation':<24}{'ops/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for name, result in results.items():
+        for operation, row in result["operations"].items():
+            print(f"{name:<10}{operation:<24}{row['throughput_per_s']:>9.1f}"
+                  f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['errors']:>8}")
+    print()
+    for name, result in results.items():
+        print(f"{name:<10}writes {result['write_throughput_per_s']:8.1f}/s   reads {result['read_throughput_per_s']:8.1f}/s")
+
+
+def main():
+    args = parse_args()
+    results = {}
+    for name, options in configurations().items():
+        print(f"Running '{name}' for {args.duration:.0f}s ...")
+        results[name] = run_configuration(name, options, args)
+    print_report(results)
+
+    commit = git_commit()
+    output = args.output or RESULTS_DIR / f"db_{datetime.now():%Y%m%d_%H%M%S}_{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()},
+        "results": results,
+    }, indent=2))
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
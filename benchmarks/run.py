@@ -0,0 +1,139 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+from .stats import LatencyRecorder
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="In-process load and latency benchmark for the resort backend.")
+    parser.add_argument("--guests", type=int, default=20, help="concurrent virtual guests sending chat turns")
+    parser.add_argument("--pollers", type=int, default=2, help="concurrent dashboards polling /orders and /requests")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds to run the workload")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="pause between a guest's chat turns")
+    parser.add_argument("--poll-interval-ms", type=float, default=1000.0, help="pause between dashboard refreshes")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="artificial latency per stub LLM call")
+    parser.add_argument("--seed-orders", type=int, default=0, help="pre-existing orders to insert before the run")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, help="result JSON path (default: benchmarks/results/<time>_<commit>.json)")
+    return parser.parse_args()
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def configure_environment(args):
+    # Must run before anything under backend/ is imported: the engine and the
+    # LLM provider are both created at import time from these variables.
+    db_dir = tempfile.mkdtemp(prefix="resort-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_dir}/bench.db"
+    os.environ.setdefault("LLM_BACKEND", "stub")
+    os.environ["LLM_STUB_LATENCY_MS"] = str(args.llm_latency_ms)
+    # Metrics stay on, as in production; per-request trace lines would only flood the terminal
+    os.environ.setdefault("TRACE_SAMPLE_RATE", "0")
+    os.environ.setdefault("TRACE_SLOW_MS", "0")
+
+
+def seed_database(seed_orders):
+    from backend.database import SessionLocal
+    from backend.models import Order
+    # The repo's seeding scripts print every item they add
+    with contextlib.redirect_stdout(io.StringIO()):
+        from seed_data import seed_menu, seed_rooms
+        from add_menu_items import add_menu_items
+        from add_remaining_menu import add_remaining_items
+        seed_menu()
+        seed_rooms()
+        add_menu_items()
+        add_remaining_items()
+
+    db = SessionLocal()
+    for i in range(seed_orders):
+        db.add(Order(room_number=str(100 + i % 350), items=[{"name": "Masala Dosa", "quantity": 1, "price": 120}],
+                     total_amount=120, status="Delivered"))
+    db.commit()
+    db.close()
+
+
+async def benchmark(args, recorder):
+    import httpx
+    from backend.main import app
+    from backend.agents import manager
+    from .workload import instrument_stages, run_workload
+
+    restore = instrument_stages(recorder, manager)
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            return await run_workload(
+                client, recorder,
+                guests=args.guests,
+                pollers=args.pollers,
+                duration=args.duration,
+                seed=args.seed,
+                think_seconds=args.think_ms / 1000,
+                poll_interval_seconds=args.poll_interval_ms / 1000,
+            )
+    finally:
+        restore()
+
+
+def print_report(result):
+    print(f"\n{'name':<40}{'count':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for section in ("endpoints", "stages"):
+        for name, row in result[section].items():
+            print(f"{name:<40}{row['count']:>8}{row['throughput_per_s']:>9.1f}"
+                  f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['errors']:>8}")
+    print(f"\nTotal throughput: {result['total_throughput_per_s']:.1f} req/s over {result['duration_s']:.1f}s")
+
+
+def main():
+    args = parse_args()
+    configure_environment(args)
+    seed_database(args.seed_orders)
+
+    recorder = LatencyRecorder()
+    # The agents print every routing decision and tool call; keep the report readable
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        duration = asyncio.run(benchmark(args, recorder))
+
+    report = recorder.report(duration)
+    endpoints = {k.split(":", 1)[1]: v for k, v in report.items() if k.startswith("endpoint:")}
+    stages = {k.split(":", 1)[1]: v for k, v in report.items() if k.startswith("stage:")}
+    commit = git_commit()
+    result = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "llm_backend": os.environ["LLM_BACKEND"],
+        "config": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()},
+        "duration_s": duration,
+        "total_throughput_per_s": sum(row["count"] for row in endpoints.values()) / duration,
+        "endpoints": endpoints,
+        "stages": stages,
+    }
+    print_report(result)
+
+    output = args.output or RESULTS_DIR / f"{datetime.now():%Y%m%d_%H%M%S}_{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
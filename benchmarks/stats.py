@@ -0,0 +1,50 @@
+import math
+import threading
+from collections import defaultdict
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+def summarize(samples, duration):
+    samples = sorted(samples)
+    return {
+        "count": len(samples),
+        "throughput_per_s": len(samples) / duration if duration else 0.0,
+        "mean_ms": sum(samples) / len(samples) if samples else 0.0,
+        "p50_ms": percentile(samples, 50),
+        "p95_ms": percentile(samples, 95),
+        "p99_ms": percentile(samples, 99),
+        "max_ms": samples[-1] if samples else 0.0,
+    }
+
+
+class LatencyRecorder:
+    """Thread-safe collection of latency samples (milliseconds) keyed by name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, name, elapsed_ms):
+        with self._lock:
+            self.samples[name].append(elapsed_ms)
+
+    def record_error(self, name):
+        with self._lock:
+            self.errors[name] += 1
+
+    def report(self, duration):
+        with self._lock:
+            names = sorted(set(self.samples) | set(self.errors))
+            report = {}
+            for name in names:
+                report[name] = summarize(self.samples.get(name, []), duration)
+                report[name]["errors"] = self.errors.get(name, 0)
+            return report
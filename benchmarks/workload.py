@@ -0,0 +1,120 @@
+import asyncio
+import functools
+import random
+import time
+
+# --- Virtual guest workload ---
+# Each guest holds one conversation and keeps sending chat turns drawn from
+# CHAT_SCENARIOS; dashboard pollers fetch /orders and /requests on a fixed
+# interval, like the Streamlit dashboard does.
+
+CHAT_SCENARIOS = {
+    "menu": [
+        "Show me the menu",
+        "What's on the breakfast menu?",
+    ],
+    "order": [
+        "I want to order 2 masala dosa for room {room}",
+        "Please order 1 butter chicken and 2 garlic naan for room {room}",
+    ],
+    "room_service": [
+        "I need fresh towels in room {room}",
+        "Please send housekeeping to room {room} for cleaning",
+    ],
+    "faq": [
+        "What's the wifi password?",
+        "What time is check-out?",
+        "Is the pool open?",
+    ],
+}
+
+DEFAULT_WEIGHTS = {"menu": 1, "order": 2, "room_service": 2, "faq": 2}
+
+
+def instrument(owner, attr, recorder, stage):
+    """
+    Wraps owner.attr so each call records its duration under a stage name.
+    `stage` is a string or a function of the call's (args, kwargs).
+    Returns a function that restores the original attribute.
+    """
+    original = getattr(owner, attr)
+
+    @functools.wraps(original)
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            name = stage(args, kwargs) if callable(stage) else stage
+            recorder.record(f"stage:{name}", (time.perf_counter() - start) * 1000)
+
+    setattr(owner, attr, timed)
+    return lambda: setattr(owner, attr, original)
+
+
+def instrument_stages(recorder, manager):
+    """Times routing, whole agent turns, LLM calls, each tool and tool dispatch (tools plus the commit)."""
+    from backend.agents import AgentManager, ResortAgent
+
+    chat_class = type(manager.get_agent("Receptionist").new_session())
+    restores = [
+        instrument(AgentManager, "route_request", recorder, "route"),
+        instrument(ResortAgent, "process_message", recorder, "agent"),
+        instrument(ResortAgent, "call_tool", recorder, lambda args, kwargs: f"tool:{args[1]}"),
+        instrument(ResortAgent, "dispatch_tools", recorder, "dispatch"),
+        instrument(chat_class, "send", recorder, "llm"),
+    ]
+    return lambda: [restore() for restore in restores]
+
+
+async def timed_request(client, recorder, label, method, url, **kwargs):
+    start = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+    except Exception:
+        recorder.record_error(f"endpoint:{label}")
+        return None
+    elapsed = (time.perf_counter() - start) * 1000
+    if response.status_code >= 400:
+        recorder.record_error(f"endpoint:{label}")
+    else:
+        recorder.record(f"endpoint:{label}", elapsed)
+    return response
+
+
+async def guest(client, recorder, guest_id, deadline, rng, weights, think_seconds):
+    room = str(rng.randint(100, 450))
+    conversation_id = None  # Issued by the first /chat response
+    scenarios = list(weights)
+    scenario_weights = [weights[s] for s in scenarios]
+
+    while time.perf_counter() < deadline:
+        scenario = rng.choices(scenarios, scenario_weights)[0]
+        message = rng.choice(CHAT_SCENARIOS[scenario]).format(room=room)
+        payload = {"message": message, "conversation_id": conversation_id}
+        response = await timed_request(client, recorder, f"POST /chat [{scenario}]", "POST", "/chat", json=payload)
+        if response is not None and response.status_code == 200:
+            conversation_id = response.json()["conversation_id"]
+        if think_seconds:
+            await asyncio.sleep(think_seconds)
+
+
+async def dashboard_poller(client, recorder, deadline, interval_seconds):
+    while time.perf_counter() < deadline:
+        await timed_request(client, recorder, "GET /orders", "GET", "/orders")
+        await timed_request(client, recorder, "GET /requests", "GET", "/requests")
+        await asyncio.sleep(interval_seconds)
+
+
+async def run_workload(client, recorder, guests, pollers, duration, seed=42,
+                       weights=None, think_seconds=0.0, poll_interval_seconds=1.0):
+    weights = weights or DEFAULT_WEIGHTS
+    deadline = time.perf_counter() + duration
+    tasks = [
+        guest(client, recorder, i, deadline, random.Random(seed + i), weights, think_seconds)
+        for i in range(guests)
+    ]
+    tasks += [dashboard_poller(client, recorder, deadline, poll_interval_seconds) for _ in range(pollers)]
+    start = time.perf_counter()
+    await asyncio.gather(*tasks)
+    return time.perf_counter() - start
@@ -4,6 +4,7 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
+import threading
 import time
 
 # Page config
@@ -75,18 +76,100 @@ st.markdown("""
 
 API_URL = "http://localhost:8000"
 
+PAGE_SIZE = 500
+
+class EventListener:
+    """
+    Follows the backend's /events stream in a background thread, shared by all
+    dashboard sessions. `version` counts the changes seen so far; pages compare
+    it with the last value they rendered to know when to refresh.
+    """
+    def __init__(self, url):
+        self.url = url
+        self.last_event_id = None
+        self.version = 0
+        self.connected = False
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        while True:
+            try:
+                headers = {"Last-Event-ID": self.last_event_id} if self.last_event_id else {}
+                # The server sends a keepalive every 15s, so a 60s read timeout means a dead connection
+                with requests.get(self.url, stream=True, headers=headers, timeout=(5, 60)) as response:
+                    self.connected = True
+                    for line in response.iter_lines(decode_unicode=True):
+                        if line.startswith("id:"):
+                            self.last_event_id = line[3:].strip()
+                        elif line.startswith("event: reset"):
+                            self.last_event_id = None
+                            self.version += 1
+                        elif line.startswith("data:"):
+                            self.version += 1
+            except Exception:
+                pass
+            self.connected = False
+            time.sleep(2)
+
+@st.cache_resource
+def get_event_listener():
+    return EventListener(f"{API_URL}/events")
+
 # Helper functions
-def fetch_data(endpoint):
+def sync_data(endpoint, room=None):
+    """
+    Keeps a local copy of a table in the session and merges in only the rows
+    changed since the last refresh (?since= sync), so refresh cost follows
+    activity rather than history size.
+    """
+    key = f"sync_{endpoint}_{room or ''}"
+    state = st.session_state.setdefault(key, {"cursor": "0", "frame": pd.DataFrame()})
+    params = {"since": state["cursor"], "limit": PAGE_SIZE}
+    if room:
+        params["room"] = room
     try:
-        response = requests.get(f"{API_URL}/{endpoint}")
+        while True:
+            response = requests.get(f"{API_URL}/{endpoint}", params=params)
+            if response.status_code != 200:
+                st.error(f"Failed to fetch {endpoint}")
+                break
+            delta = pd.DataFrame(response.json())
+            frame = state["frame"]
+            if not delta.empty and not frame.empty:
+                # Each batch re-sends recent changes (the server's sync window); skip the ones we have
+                seen = set(zip(frame["id"], frame["updated_at"]))
+                delta = delta[[key not in seen for key in zip(delta["id"], delta["updated_at"])]]
+            if not delta.empty:
+                if not frame.empty:
+                    frame = frame[~frame["id"].isin(delta["id"])]
+                state["frame"] = pd.concat([frame, delta], ignore_index=True)
+            state["cursor"] = params["since"] = response.headers["X-Sync-Cursor"]
+            if not response.headers.get("X-Sync-More"):
+                break
+    except Exception as e:
+        st.error(f"Connection error: {e}")
+
+    frame = state["frame"]
+    if frame.empty:
+        return frame
+    return frame.sort_values(["created_at", "id"], ascending=False, ignore_index=True)
+
+def fetch_stats(room=None, status=None):
+    """Aggregates for the KPI cards and charts, computed server-side."""
+    params = {"status": status or []}
+    if room:
+        params["room"] = room
+    try:
+        response = requests.get(f"{API_URL}/stats", params=params)
         if response.status_code == 200:
             return response.json()
-        else:
-            st.error(f"Failed to fetch {endpoint}")
-            return []
+        st.error("Failed to fetch stats")
     except Exception as e:
         st.error(f"Connection error: {e}")
-        return []
+    return {
+        "orders": {"count": 0, "revenue": 0, "pending": 0, "by_status": {}, "top_rooms": []},
+        "requests": {"count": 0, "by_type": {}, "by_status": {}},
+    }
 
 def update_status(endpoint, item_id, new_status):
     try:
@@ -103,6 +186,30 @@ def update_status(endpoint, item_id, new_status):
     except Exception as e:
         st.error(f"Error: {e}")
 
+def save_status_changes(endpoint, original, edited):
+    """Sends every edited status in one PATCH; rows are matched by id, not position."""
+    before = original.set_index("id")["status"]
+    after = edited.set_index("id")["status"].reindex(before.index)
+    changed = after[after.ne(before) & after.notna()]
+    if changed.empty:
+        st.info("No changes detected")
+        return
+    changes = [{"id": int(item_id), "status": status} for item_id, status in changed.items()]
+    try:
+        response = requests.patch(f"{API_URL}/{endpoint}", json=changes)
+        if response.status_code != 200:
+            st.error("Failed to save changes")
+            return
+    except Exception as e:
+        st.error(f"Error: {e}")
+        return
+    missing = [r["id"] for r in response.json() if r["result"] != "updated"]
+    if missing:
+        st.warning(f"Not found: {', '.join(map(str, missing))}")
+    st.success(f"Updated {len(changes) - len(missing)} item(s)!")
+    time.sleep(0.5)
+    st.rerun()
+
 # Sidebar
 with st.sidebar:
     #st.image("https://via.placeholder.com/150/667eea/FFFFFF?text=Resort", use_container_width=True)
@@ -121,12 +228,20 @@ with st.sidebar:
     
     st.markdown("---")
     
-    # Auto-refresh
-    auto_refresh = st.checkbox("Auto-refresh (30s)", value=False)
-    if auto_refresh:
-        st.info("Dashboard will refresh every 30 seconds")
-        time.sleep(30)
-        st.rerun()
+    # Live updates: rerun only when the backend pushes a change
+    live_updates = st.checkbox("Live updates", value=True)
+    if live_updates:
+        listener = get_event_listener()
+        # Changes that arrive while this run is syncing trigger another run
+        st.session_state["seen_events"] = listener.version
+
+        @st.fragment(run_every=1)
+        def watch_events():
+            if listener.version != st.session_state["seen_events"]:
+                st.rerun()
+            st.caption("🟢 Live" if listener.connected else "🔴 Reconnecting to live updates...")
+
+        watch_events()
     
     if st.button("🔄 Refresh Now", use_container_width=True):
         st.rerun()
@@ -138,43 +253,33 @@ with st.sidebar:
 st.title("🏨 Resort Operations Dashboard")
 st.markdown("Real-time monitoring and management of resort operations")
 
-# Fetch data
-orders = fetch_data("orders")
-requests_data = fetch_data("requests")
-
-# Convert to DataFrames
-df_orders = pd.DataFrame(orders) if orders else pd.DataFrame()
-df_requests = pd.DataFrame(requests_data) if requests_data else pd.DataFrame()
+# Sync data (room filter applied server-side) and apply the status filter locally
+room = room_filter.strip() or None
+df_orders = sync_data("orders", room)
+df_requests = sync_data("requests", room)
 
-# Apply filters
 if not df_orders.empty and status_filter:
     df_orders = df_orders[df_orders['status'].isin(status_filter)]
-if not df_orders.empty and room_filter:
-    df_orders = df_orders[df_orders['room_number'].astype(str).str.contains(room_filter)]
-
 if not df_requests.empty and status_filter:
     df_requests = df_requests[df_requests['status'].isin(status_filter)]
-if not df_requests.empty and room_filter:
-    df_requests = df_requests[df_requests['room_number'].astype(str).str.contains(room_filter)]
+
+stats = fetch_stats(room, status_filter)
+order_stats, request_stats = stats["orders"], stats["requests"]
 
 # Statistics Cards
 col1, col2, col3, col4 = st.columns(4)
 
 with col1:
-    total_orders = len(df_orders) if not df_orders.empty else 0
-    st.metric("📦 Total Orders", total_orders)
+    st.metric("📦 Total Orders", order_stats["count"])
 
 with col2:
-    total_revenue = df_orders['total_amount'].sum() if not df_orders.empty else 0
-    st.metric("💰 Revenue", f"₹{total_revenue:,.0f}")
+    st.metric("💰 Revenue", f"₹{order_stats['revenue']:,.0f}")
 
 with col3:
-    pending_orders = len(df_orders[df_orders['status'] == 'Pending']) if not df_orders.empty else 0
-    st.metric("⏳ Pending Orders", pending_orders)
+    st.metric("⏳ Pending Orders", order_stats["pending"])
 
 with col4:
-    total_requests = len(df_requests) if not df_requests.empty else 0
-    st.metric("🧹 Service Requests", total_requests)
+    st.metric("🧹 Service Requests", request_stats["count"])
 
 st.markdown("---")
 
@@ -188,11 +293,11 @@ with tab1:
     
     with col1:
         # Order Status Distribution
-        if not df_orders.empty:
-            status_counts = df_orders['status'].value_counts()
+        status_counts = order_stats["by_status"]
+        if status_counts:
             fig = px.pie(
-                values=status_counts.values,
-                names=status_counts.index,
+                values=list(status_counts.values()),
+                names=list(status_counts.keys()),
                 title="Order Status Distribution",
                 color_discrete_sequence=px.colors.sequential.Viridis
             )
@@ -207,14 +312,15 @@ with tab1:
     
     with col2:
         # Revenue by Room (Top 10)
-        if not df_orders.empty:
-            revenue_by_room = df_orders.groupby('room_number')['total_amount'].sum().sort_values(ascending=False).head(10)
+        top_rooms = order_stats["top_rooms"]
+        if top_rooms:
+            revenue_by_room = [room["revenue"] for room in top_rooms]
             fig = px.bar(
-                x=revenue_by_room.index.astype(str),
-                y=revenue_by_room.values,
+                x=[str(room["room_number"]) for room in top_rooms],
+                y=revenue_by_room,
                 title="Top 10 Rooms by Revenue",
                 labels={'x': 'Room Number', 'y': 'Revenue (₹)'},
-                color=revenue_by_room.values,
+                color=revenue_by_room,
                 color_continuous_scale='Purples'
             )
             fig.update_layout(
@@ -228,15 +334,15 @@ with tab1:
             st.info("No revenue data available for chart")
     
     # Service Request Types
-    if not df_requests.empty:
+    request_types = request_stats["by_type"]
+    if request_types:
         st.subheader("Service Request Types")
-        request_types = df_requests['request_type'].value_counts()
         fig = px.bar(
-            x=request_types.index,
-            y=request_types.values,
+            x=list(request_types.keys()),
+            y=list(request_types.values()),
             title="Service Requests by Type",
             labels={'x': 'Request Type', 'y': 'Count'},
-            color=request_types.values,
+            color=list(request_types.values()),
             color_continuous_scale='Teal'
         )
         fig.update_layout(
@@ -313,17 +419,7 @@ with tab2:
         
         # Check for changes and update
         if st.button("💾 Save Changes", key="save_orders", use_container_width=False):
-            changes_made = False
-            for idx in range(len(df_orders_display)):
-                original_status = df_orders_display.iloc[idx]['status']
-                new_status = edited_df.iloc[idx]['status']
-                if original_status != new_status:
-                    order_id = df_orders_display.iloc[idx]['id']
-                    update_status("orders", order_id, new_status)
-                    changes_made = True
-            
-            if not changes_made:
-                st.info("No changes detected")
+            save_status_changes("orders", df_orders_display, edited_df)
         
         # Export button
         st.markdown("---")
@@ -394,17 +490,7 @@ with tab3:
         
         # Check for changes and update
         if st.button("💾 Save Changes", key="save_requests", use_container_width=False):
-            changes_made = False
-            for idx in range(len(df_requests)):
-                original_status = df_requests.iloc[idx]['status']
-                new_status = edited_requests.iloc[idx]['status']
-                if original_status != new_status:
-                    request_id = df_requests.iloc[idx]['id']
-                    update_status("requests", request_id, new_status)
-                    changes_made = True
-            
-            if not changes_made:
-                st.info("No changes detected")
+            save_status_changes("requests", df_requests, edited_requests)
         
         # Export button
         st.markdown("---")
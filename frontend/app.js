@@ -6,7 +6,8 @@ const emojiPicker = document.getElementById('emoji-picker');
 const typingIndicator = document.getElementById('typing-indicator');
 const quickReplies = document.getElementById('quick-replies');
 
-let history = [];
+// Issued by the backend on the first message; it keeps the conversation server-side
+let conversationId = null;
 
 // Format timestamp
 function getTimestamp() {
@@ -57,6 +58,7 @@ function addMessage(content, role) {
     }
 
     chatMessages.scrollTop = chatMessages.scrollHeight;
+    return text;
 }
 
 // Show typing indicator
@@ -78,33 +80,45 @@ async function sendMessage(text = null) {
     addMessage(messageText, 'user');
     userInput.value = '';
 
-
-    // Add to history
-    history.push({ role: "user", content: messageText });
-
     // Show typing indicator
     showTyping();
 
     try {
-        const response = await fetch('http://localhost:8000/chat', {
+        const response = await fetch('http://localhost:8000/chat/stream', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
             },
-            body: JSON.stringify({ history: history })
+            body: JSON.stringify({ message: messageText, conversation_id: conversationId })
         });
 
-        hideTyping();
-
         if (!response.ok) {
             throw new Error('Network response was not ok');
         }
 
-        const data = await response.json();
-        const botResponse = data.response;
+        // Render tokens as they arrive; the bubble is created on the first one
+        let botText = null;
+        let botResponse = '';
+        await readEventStream(response, (event) => {
+            if (event.type === 'conversation') {
+                conversationId = event.conversation_id;
+            } else if (event.type === 'token') {
+                if (!botText) {
+                    hideTyping();
+                    botText = addMessage('', 'bot');
+                }
+                botResponse += event.text;
+                botText.textContent = botResponse;
+                chatMessages.scrollTop = chatMessages.scrollHeight;
+            } else if (event.type === 'error') {
+                throw new Error(event.detail);
+            }
+        });
 
-        addMessage(botResponse, 'bot');
-        history.push({ role: "assistant", content: botResponse });
+        hideTyping();
+        if (!botText) {
+            throw new Error('Empty response');
+        }
 
     } catch (error) {
         hideTyping();
@@ -113,6 +127,30 @@ async function sendMessage(text = null) {
     }
 }
 
+// Parse a Server-Sent Events body, calling onEvent with each decoded `data:` payload
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const frame = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            const data = frame.split('\n')
+                .filter(line => line.startsWith('data: '))
+                .map(line => line.slice(6))
+                .join('\n');
+            if (data) onEvent(JSON.parse(data));
+        }
+    }
+}
+
 // Emoji picker toggle
 emojiBtn.addEventListener('click', (e) => {
     e.stopPropagation();
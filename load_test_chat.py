@@ -0,0 +1,101 @@
+"""
+Load test: /orders latency must stay flat while chat turns are in flight.
+
+Runs the FastAPI app in-process against a throwaway SQLite database and
+replaces the LLM turn with a blocking sleep, so no API key is needed.
+
+    python load_test_chat.py
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+
+# Point the app at a throwaway database before anything under backend/ is imported
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'load_test.db')}"
+# Turns here are deliberately slow; keep the per-request trace log out of the report
+os.environ.setdefault("TRACE_SAMPLE_RATE", "0")
+os.environ.setdefault("TRACE_SLOW_MS", "0")
+
+from backend.database import Base, SessionLocal, engine
+from backend.main import app
+from backend.agents import manager
+from backend.models import Order
+
+CHATS_IN_FLIGHT = 50
+CHAT_TURN_SECONDS = 2.0
+ORDERS_PROBES = 40
+
+
+def setup_database():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    for i in range(200):
+        db.add(Order(room_number=str(100 + i % 50), items=[{"name": "Masala Dosa", "quantity": 1, "price": 120}],
+                     total_amount=120, status="Pending"))
+    db.commit()
+    db.close()
+
+
+def slow_chat(history, conversation_id=None):
+    # Stand-in for the router + agent LLM calls: blocks its thread, like the real SDK does
+    time.sleep(CHAT_TURN_SECONDS)
+    return "ok"
+
+
+async def probe_orders(client, n):
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        response = await client.get("/orders")
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200
+        await asyncio.sleep(0.02)
+    return latencies
+
+
+def summarize(label, latencies):
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{label:<28} p50={p50:7.1f} ms   p95={p95:7.1f} ms   max={latencies[-1]:7.1f} ms")
+    return p95
+
+
+async def main():
+    setup_database()
+    manager.chat = slow_chat
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+        idle_p95 = summarize("/orders (idle)", await probe_orders(client, ORDERS_PROBES))
+
+        payload = {"history": [{"role": "user", "content": "Show me the menu"}]}
+        chats = [asyncio.create_task(client.post("/chat", json=payload)) for _ in range(CHATS_IN_FLIGHT)]
+        await asyncio.sleep(0.1)
+        stats = (await client.get("/chat/stats")).json()
+        print(f"chat turns: in_flight={stats['in_flight']} queued={stats['queued']}")
+
+        loaded_p95 = summarize(f"/orders ({CHATS_IN_FLIGHT} chats)", await probe_orders(client, ORDERS_PROBES))
+        responses = await asyncio.gather(*chats)
+
+    codes = [r.status_code for r in responses]
+    print(f"chat responses: {codes.count(200)} ok, {codes.count(503)} rejected (503)")
+    # 50 turns fit within the in-flight and queue limits, so every one must succeed
+    if any(code // 100 != 2 for code in codes):
+        print("FAILED: not every chat turn succeeded")
+        sys.exit(1)
+
+    # A blocked event loop would push /orders to roughly CHAT_TURN_SECONDS
+    if loaded_p95 > max(idle_p95 * 5, 100):
+        print("FAILED: /orders latency degraded while chats were in flight")
+        sys.exit(1)
+    print("PASSED: /orders latency stayed flat")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
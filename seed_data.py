@@ -1,5 +1,5 @@
 from backend.database import engine, SessionLocal, Base
-from backend.models import MenuItem
+from backend.models import MenuItem, Room
 
 # Create tables
 Base.metadata.create_all(bind=engine)
@@ -34,5 +34,35 @@ def seed_menu():
     print("Menu seeded successfully!")
     db.close()
 
+def room_inventory(floors=4, rooms_per_floor=30):
+    """Rooms 101..430: per floor, 20 Standard, 7 Deluxe and 3 Suites."""
+    rooms = []
+    for floor in range(1, floors + 1):
+        for i in range(1, rooms_per_floor + 1):
+            if i <= rooms_per_floor * 2 // 3:
+                room_type, price = "Standard", 100
+            elif i <= rooms_per_floor * 9 // 10:
+                room_type, price = "Deluxe", 200
+            else:
+                room_type, price = "Suite", 500
+            rooms.append({"number": f"{floor}{i:02d}", "room_type": room_type, "price": price})
+    return rooms
+
+def seed_rooms(floors=4, rooms_per_floor=30):
+    db = SessionLocal()
+
+    if db.query(Room).count() > 0:
+        print("Rooms already seeded.")
+        db.close()
+        return
+
+    for room in room_inventory(floors, rooms_per_floor):
+        db.add(Room(**room))
+
+    db.commit()
+    print("Rooms seeded successfully!")
+    db.close()
+
 if __name__ == "__main__":
     seed_menu()
+    seed_rooms()
@@ -0,0 +1,197 @@
+"""
+Stress test: hundreds of guests booking rooms at once must never double-book.
+
+Runs the booking path (backend/reservations.py) from many threads against a
+throwaway SQLite database. The seeded hotel's 120 rooms are booked for stays
+in the next ten days, so attempts race for the same rooms and nights (the 12
+Suites go within the first wave). Half the holds are confirmed and the rest
+left to lapse; a second wave then books over the lapsed holds. After each wave
+no room may have two active bookings on the same night, every reservation
+must have all of its rooms or none, and the availability bitmaps must agree
+with the database. Before the waves it checks that room counts sent as floats,
+as Gemini sends them, book like whole numbers.
+
+    python stress_test_bookings.py
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+# Point the app at a throwaway database before anything under backend/ is imported
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'stress_test.db')}"
+# Short holds, so the second wave can book over the ones left to lapse
+os.environ.setdefault("BOOKING_HOLD_SECONDS", "2")
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+from sqlalchemy import insert, text
+
+from backend.availability import availability
+from backend.database import SessionLocal, init_db
+from backend.models import Booking, Room
+from backend.reservations import BOOKING_HOLD_SECONDS, cancel_reservation, confirm_reservation, hold_rooms
+from seed_data import room_inventory
+
+ATTEMPTS_PER_WAVE = 400
+THREADS = 32
+STAY_WINDOW_DAYS = 10  # Stays start within this many days, so they overlap a lot
+ROOM_TYPES = ["Standard", "Deluxe", "Suite"]
+
+# Second-wave bookings on room nights whose first-wave hold lapsed
+REUSED = text("""
+    SELECT COUNT(DISTINCT b.id) FROM bookings a JOIN bookings b
+      ON a.room_id = b.room_id AND a.id < b.id
+     AND a.check_in < b.check_out AND b.check_in < a.check_out
+    WHERE a.status = 'Held' AND a.hold_expires_at <= :now AND b.status = 'Confirmed'
+""")
+
+OVERLAPS = text("""
+    SELECT a.room_id, a.id, b.id FROM bookings a JOIN bookings b
+      ON a.room_id = b.room_id AND a.id < b.id
+     AND a.check_in < b.check_out AND b.check_in < a.check_out
+    WHERE (a.status = 'Confirmed' OR (a.status = 'Held' AND a.hold_expires_at > :now))
+      AND (b.status = 'Confirmed' OR (b.status = 'Held' AND b.hold_expires_at > :now))
+""")
+
+
+def setup_database():
+    init_db()
+    db = SessionLocal()
+    db.execute(insert(Room), room_inventory())
+    db.commit()
+    db.close()
+
+
+def random_request(rng):
+    rooms = {}
+    for _ in range(rng.choice([1, 1, 1, 2, 3])):
+        room_type = rng.choice(ROOM_TYPES)
+        rooms[room_type] = rooms.get(room_type, 0) + 1
+    check_in = date.today() + timedelta(days=rng.randint(0, STAY_WINDOW_DAYS - 1))
+    return rooms, check_in, check_in + timedelta(days=rng.randint(1, 4))
+
+
+def run_wave(label, seed, confirm_share):
+    rng = random.Random(seed)
+    requests = [random_request(rng) for _ in range(ATTEMPTS_PER_WAVE)]
+    start_together = threading.Barrier(THREADS)
+    outcomes = []  # (held reservation or None, latency ms)
+
+    def attempt(i):
+        if i < THREADS:
+            start_together.wait()  # The first wave of threads fires at the same instant
+        rooms, check_in, check_out = requests[i]
+        started = time.perf_counter()
+        try:
+            reservation = hold_rooms(rooms, check_in, check_out, guest_name=f"guest-{seed}-{i}")
+            if random.random() < confirm_share:
+                confirm_reservation(reservation.reference)
+        except ValueError:
+            reservation = None  # Sold out: the expected answer for most racers
+        outcomes.append((reservation, rooms, (time.perf_counter() - started) * 1000))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        list(pool.map(attempt, range(ATTEMPTS_PER_WAVE)))  # Re-raises anything but "sold out"
+    elapsed = time.perf_counter() - started
+
+    held = [(reservation, rooms) for reservation, rooms, _ in outcomes if reservation]
+    latencies = sorted(latency for _, _, latency in outcomes)
+    rooms_held = sum(len(reservation.rooms) for reservation, _ in held)
+    print(f"{label:<8} {len(outcomes)} attempts in {elapsed:.2f}s: {len(held)} booked ({rooms_held} rooms), "
+          f"{len(outcomes) - len(held)} sold out | {len(held) / elapsed:.0f} bookings/s, "
+          f"{len(outcomes) / elapsed:.0f} attempts/s | p50={statistics.median(latencies):.1f} ms "
+          f"p95={latencies[int(len(latencies) * 0.95) - 1]:.1f} ms")
+    return held
+
+
+def check(label, held):
+    """Returns a list of problems found; empty if none."""
+    problems = []
+    db = SessionLocal()
+    try:
+        overlaps = db.execute(OVERLAPS, {"now": datetime.utcnow()}).all()
+        if overlaps:
+            problems.append(f"{label}: {len(overlaps)} double-booked room nights, e.g. room/bookings {overlaps[0]}")
+
+        for reservation, rooms in held:
+            booked = db.query(Booking).filter(Booking.reference == reservation.reference).count()
+            if booked != sum(rooms.values()):
+                problems.append(f"{label}: {reservation.reference} has {booked} rooms, asked for {sum(rooms.values())}")
+
+        today = date.today()
+        for day in range(STAY_WINDOW_DAYS):
+            check_in = today + timedelta(days=day)
+            free = availability.free_counts(check_in, check_in + timedelta(days=1))
+            taken = dict(db.execute(text("""
+                SELECT r.room_type, COUNT(DISTINCT b.room_id) FROM bookings b JOIN rooms r ON r.id = b.room_id
+                WHERE b.check_in <= :night AND b.check_out > :night
+                  AND (b.status = 'Confirmed' OR (b.status = 'Held' AND b.hold_expires_at > :now))
+                GROUP BY r.room_type
+            """), {"night": check_in, "now": datetime.utcnow()}).all())
+            totals = {room_type: count for room_type, (count, _) in availability.room_types().items()}
+            for room_type, total in totals.items():
+                if free[room_type] != total - taken.get(room_type, 0):
+                    problems.append(f"{label}: bitmaps say {free[room_type]} {room_type} free on {check_in}, "
+                                    f"database says {total - taken.get(room_type, 0)}")
+    finally:
+        db.close()
+    return problems
+
+
+def check_float_counts():
+    """Gemini sends room counts as floats ({"Deluxe": 2.0}); they must book like ints."""
+    problems = []
+    try:
+        reservation = hold_rooms({"Deluxe": 2.0}, date.today(), date.today() + timedelta(days=1))
+        if len(reservation.rooms) != 2:
+            problems.append(f"asked for 2.0 Deluxe rooms, held {len(reservation.rooms)}")
+        cancel_reservation(reservation.reference)
+    except ValueError as e:
+        problems.append(f"2.0 Deluxe rooms rejected: {e}")
+    try:
+        hold_rooms({"Deluxe": 1.5}, date.today(), date.today() + timedelta(days=1))
+        problems.append("1.5 Deluxe rooms were held")
+    except ValueError:
+        pass
+    return problems
+
+
+def main():
+    setup_database()
+    float_problems = check_float_counts()
+    rooms = sum(count for count, _ in availability.room_types().values())
+    print(f"{THREADS} threads, {ATTEMPTS_PER_WAVE} attempts per wave, {rooms} rooms, "
+          f"stays within {STAY_WINDOW_DAYS} days, holds last {BOOKING_HOLD_SECONDS:g}s")
+
+    first = run_wave("wave 1", seed=1, confirm_share=0.5)
+    problems = float_problems + check("wave 1", first)
+
+    time.sleep(BOOKING_HOLD_SECONDS + 0.5)  # Let the unconfirmed holds lapse
+    second = run_wave("wave 2", seed=2, confirm_share=1.0)
+    problems += check("wave 2", second)
+
+    db = SessionLocal()
+    reused = db.execute(REUSED, {"now": datetime.utcnow()}).scalar()
+    db.close()
+    print(f"wave 2 booked {reused} rooms over lapsed holds")
+    if not reused:
+        problems.append("no room freed by a lapsed hold was booked again")
+
+    if not first or not second:
+        problems.append("no bookings went through")
+    for problem in problems:
+        print(f"  {problem}")
+    if problems:
+        print("FAILED: rooms were overbooked or reservations were split")
+        sys.exit(1)
+    print("PASSED: no room was booked twice")
+
+
+if __name__ == "__main__":
+    main()
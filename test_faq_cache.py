@@ -0,0 +1,77 @@
+"""
+Checks the FAQ answer cache (backend/faq_cache.py): reworded and misspelt
+questions are answered from the cache, questions about a different facility
+never are, answers expire, and changing facility data drops them.
+
+    python test_faq_cache.py
+"""
+import os
+import sys
+import time
+
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+from backend.faq_cache import FaqCache, note_tool_call, tracking_tool_calls
+from backend.tools import FACILITIES, get_facility_info, update_facility
+
+failures = []
+
+
+def check(label, ok):
+    print(f"{'ok  ' if ok else 'FAIL'} {label}")
+    if not ok:
+        failures.append(label)
+
+
+def answer(cache, question, facility):
+    """Answers the way a receptionist turn would, and lets the cache learn from it."""
+    with tracking_tool_calls() as turn:
+        note_tool_call("get_facility_info", get_facility_info(facility))
+    cache.learn(question, turn)
+
+
+cache = FaqCache(enabled=True)
+answer(cache, "What time is check-in?", "check-in")
+answer(cache, "When does the gym open?", "gym")
+answer(cache, "What is the wifi password?", "wifi")
+answer(cache, "When does the swimming pool open?", "pool")
+
+# Rewordings and typos of a cached question are hits
+check("same question, other words", cache.lookup("check in time please") == FACILITIES["checkin"])
+check("typo in a word", cache.lookup("what is the wifi pasword") == FACILITIES["wifi"])
+check("typo in the facility", cache.lookup("When does the swiming pool open?") == FACILITIES["pool"])
+
+# A question about something else is never answered from a near-identical one
+check("check-out never matches check-in", cache.lookup("What time is check-out?") is None)
+gym_only = FaqCache(enabled=True)
+answer(gym_only, "When does the gym open?", "gym")
+check("pool never matches gym", gym_only.lookup("When does the pool open?") is None)
+check("unrelated question misses", cache.lookup("Can I get extra towels?") is None)
+
+# Answers expire after the TTL
+short_lived = FaqCache(enabled=True, ttl=0.2)
+answer(short_lived, "Where can I park?", "parking")
+check("hit before the TTL", short_lived.lookup("Where can I park?") == FACILITIES["parking"])
+time.sleep(0.3)
+check("miss after the TTL", short_lived.lookup("Where can I park?") is None)
+
+# Changing facility data drops every cached answer
+old_hours = FACILITIES["gym"]
+update_facility("gym", "The Gym is open 24 hours.")
+try:
+    check("update_facility drops cached answers", cache.lookup("When does the gym open?") is None)
+    answer(cache, "When does the gym open?", "gym")
+    check("new answer is cached", cache.lookup("When does the gym open?") == "The Gym is open 24 hours.")
+
+    # A turn that read the old data but finished after the change must not be cached
+    with tracking_tool_calls() as turn:
+        note_tool_call("get_facility_info", get_facility_info("pool"))
+        update_facility("pool", FACILITIES["pool"])
+    check("answer built before a change is not cached", not cache.learn("When does the pool open?", turn))
+finally:
+    update_facility("gym", old_hours)
+
+if failures:
+    print(f"FAILED: {len(failures)} check(s) failed")
+    sys.exit(1)
+print("PASSED: FAQ cache hits, misses, expiry and invalidation")